@@ -1,7 +1,4 @@
-import streamlit as st
-from datetime import datetime
-import matplotlib.pyplot as plt
-from modules import utils as util
+from modules.layout import render_shell
 
 from modules.mod1 import render_produccion
 from modules.mod2 import render_stock
@@ -10,42 +7,15 @@ from modules.mod4 import render_insumos_pagos
 from modules.mod5 import render_reportes
 
 
+# Un renderer por pestaña, en el orden de layout.TAB_LABELS
+RENDERERS = [
+    render_produccion,
+    render_stock,
+    render_ventas,
+    render_insumos_pagos,
+    render_reportes
+]
 
-# Cargar el logo (ruta relativa al directorio desde donde ejecutas streamlit)
-st.set_page_config(page_title="Pio Pio Baena", page_icon="images/Logo.png", layout="wide")
-col_title, col_logo = st.columns([6,2])
-with col_title:
-    st.title("Pio Pio Baena - Gestión Avícola")
-with col_logo:
-    util.show_logo(width=90)
-#util.set_custom_style_2()
-estilo = st.sidebar.radio("Seleccionar Estilo Visual", ["Original (Verde)", "Cosecha (Cálido)", "Tecno (Limpio)"])
-
-if estilo == "Original (Verde)":
-    util.set_custom_style_2()
-elif estilo == "Cosecha (Cálido)":
-    util.set_harvest_style()
-else:
-    util.set_techno_agro_style()
-#st.divider()
-
-# app.py
-tabs = st.tabs([
-    "📊 Producción",
-    "📦 Stock",
-    "🚚 Ventas",
-    "💰 Insumos y Pagos",
-    "📈 Reportes"
-])
-
-with tabs[0]:
-    render_produccion()
-with tabs[1]:
-    render_stock()
-with tabs[2]:
-    render_ventas()
-with tabs[3]:
-    render_insumos_pagos()
-# En tabs[4] (Reportes)
-with tabs[4]:
-    render_reportes()
\ No newline at end of file
+for tab, render in zip(render_shell(), RENDERERS):
+    with tab:
+        render()
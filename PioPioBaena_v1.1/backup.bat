@@ -28,9 +28,11 @@ if not exist data\granja.db (
     exit /b 1
 )
 
-REM Copiar base de datos
+REM Copiar base de datos con la API de backup de SQLite: en modo WAL los
+REM cambios recientes pueden estar aun en granja.db-wal, y la API genera un
+REM unico archivo consistente aunque la aplicacion este abierta
 echo Creando backup de la base de datos...
-copy data\granja.db backups\granja_backup_%timestamp%.db >nul
+python -c "import sqlite3; o = sqlite3.connect('data/granja.db'); d = sqlite3.connect('backups/granja_backup_%timestamp%.db'); o.backup(d); d.close(); o.close()"
 
 if %errorlevel% equ 0 (
     echo.
@@ -72,6 +74,8 @@ echo.
 echo 3. Para restaurar un backup:
 echo    - Cierra la aplicacion
 echo    - Renombra data\granja.db a data\granja_old.db
+echo    - Renombra tambien data\granja.db-wal y data\granja.db-shm, si existen,
+echo      a data\granja_old.db-wal y data\granja_old.db-shm
 echo    - Copia el backup a data\granja.db
 echo    - Inicia la aplicacion
 echo.
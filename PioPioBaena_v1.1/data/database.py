@@ -1,21 +1,122 @@
-import sqlite3
+import os
+import queue
+import threading
 from contextlib import contextmanager
+from datetime import date, time
+from functools import lru_cache
 from pathlib import Path
 
+import streamlit as st
+
+try:
+    # pysqlite3-binary (opcional) trae una versión de SQLite más reciente que
+    # la incluida en Python, con mejoras del planificador; misma API DB-API
+    import pysqlite3.dbapi2 as sqlite3
+except ImportError:
+    import sqlite3
+
+# Adaptadores registrados una vez por proceso: los repositorios reciben
+# date/time de los widgets y sqlite3 los guarda como 'YYYY-MM-DD' / 'HH:MM:SS'
+# sin formatear cadenas en cada llamada. (El adaptador implícito de date está
+# obsoleto desde Python 3.12; se registra explícitamente con el mismo formato.)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(time, lambda t: t.isoformat(timespec='seconds'))
+
+# Versión del schema registrada en PRAGMA user_version.
+# Incrementar al modificar schema.sql para que las bases existentes se actualicen.
+SCHEMA_VERSION = 8
+
+# Columnas añadidas después de crear las tablas: (tabla, columna, definición).
+# schema.sql ya las incluye para bases nuevas; en bases existentes se agregan
+# con ALTER TABLE antes de ejecutar el schema. SQLite solo permite añadir
+# columnas generadas VIRTUAL (no STORED) con ALTER TABLE.
+COLUMNAS_MIGRADAS = [
+    ("pedidos", "total_canastillas",
+     "INTEGER GENERATED ALWAYS AS (canastillas_c + canastillas_b + canastillas_a + "
+     "canastillas_aa + canastillas_aaa + canastillas_jumbo) VIRTUAL"),
+    ("produccion_diaria", "total_huevos",
+     "INTEGER GENERATED ALWAYS AS (tipo_c + tipo_b + tipo_a + "
+     "tipo_aa + tipo_aaa + tipo_jumbo) VIRTUAL"),
+    ("movimientos_financieros", "categoria_grupo",
+     "TEXT GENERATED ALWAYS AS (CASE WHEN categoria LIKE '%Alimento%' THEN 'alimento' "
+     "WHEN categoria LIKE '%trabajador%' THEN 'trabajador' ELSE 'otro' END) VIRTUAL"),
+]
+
+# Sentencias preparadas que guarda cada conexión (por defecto sqlite3 guarda
+# 128; los repositorios ya rondan esa cifra de consultas distintas)
+CACHED_STATEMENTS = 256
+
+# Resultados de execute_query memorizados en proceso. Las búsquedas por id
+# (obtener_cliente, obtener_trabajador, obtener_pedido) ocupan una entrada
+# por id, así que el tamaño deja lugar para ellas junto a los reportes.
+QUERY_CACHE_SIZE = 1024
+
+# Segundos que una conexión espera un bloqueo antes de fallar con "database is locked"
+BUSY_TIMEOUT = 5.0
+
+# PIOPIO_SQL_DEBUG=1 imprime cada sentencia SQL ejecutada (depuración)
+SQL_DEBUG = os.environ.get("PIOPIO_SQL_DEBUG") == "1"
+
+def _trazar_sql(sentencia):
+    """Callback de depuración: muestra cada sentencia que ejecuta SQLite"""
+    print(f"🔎 SQL: {' '.join(sentencia.split())}")
+
+
+@lru_cache(maxsize=CACHED_STATEMENTS)
+def _sql_con_returning(query):
+    """
+    Texto del INSERT con RETURNING id, construido una vez por consulta.
+    Cada execute_insert pasa siempre el mismo objeto str, que sqlite3 encuentra
+    directamente en su caché de sentencias preparadas (cached_statements)
+    sin volver a armar ni comparar el texto.
+    """
+    return f"{query} RETURNING id"
+
+
+@lru_cache(maxsize=1)
+def _load_schema(schema_path):
+    """
+    Lee el contenido de schema.sql una sola vez por proceso.
+    
+    Args:
+        schema_path (Path): Ruta resuelta al archivo schema.sql
+        
+    Returns:
+        str: Contenido del schema
+    """
+    if not schema_path.exists():
+        raise FileNotFoundError(f"No se encontró el archivo schema.sql en {schema_path}")
+    
+    with open(schema_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
 class Database:
     """
     Clase para gestionar la conexión y creación de la base de datos SQLite.
     Implementa el patrón Context Manager para manejo seguro de conexiones.
+    
+    Usa una única conexión de escritura, serializada con un lock, y un pool
+    de conexiones de solo lectura (mode=ro). Con WAL, las lecturas avanzan
+    mientras se escribe en lugar de esperar al escritor.
     """
     
-    def __init__(self, db_path='data/granja.db'):
+    def __init__(self, db_path='data/granja.db', pool_size=5):
         """
         Inicializa la base de datos.
         
         Args:
             db_path (str): Ruta al archivo de base de datos
+            pool_size (int): Número máximo de conexiones de lectura inactivas en el pool
         """
         self.db_path = db_path
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._writer = None
+        self._write_lock = threading.RLock()
+        # Se incrementa con cada commit que modifica datos (clave de los cachés)
+        self.data_version = 0
+        # Memoización en proceso de execute_query, compartida entre sesiones
+        self._query_cache = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._execute_query_raw)
         self._ensure_data_directory()
         self.init_db()
     
@@ -23,66 +124,207 @@ class Database:
         """Crea el directorio 'data' si no existe"""
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
     
+    def _create_connection(self, solo_lectura=False):
+        """
+        Abre una nueva conexión configurada.
+        
+        check_same_thread=False permite que la conexión vuelva al pool y la
+        use otro hilo de Streamlit; el pool (o el lock de escritura) garantiza
+        que solo un hilo la tenga a la vez.
+        
+        cached_statements fija cuántas sentencias preparadas guarda cada
+        conexión: las consultas de los repositorios se compilan una vez y
+        luego se reutilizan en cada llamada.
+        
+        isolation_level=None desactiva los BEGIN implícitos del módulo sqlite3:
+        las transacciones las abre get_connection() con BEGIN IMMEDIATE.
+        
+        Args:
+            solo_lectura (bool): Abrir con mode=ro (las escrituras fallan)
+        """
+        if solo_lectura:
+            uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT,
+                                   check_same_thread=False, isolation_level=None,
+                                   cached_statements=CACHED_STATEMENTS)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT,
+                                   check_same_thread=False, isolation_level=None,
+                                   cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
+        # Configuración aplicada una vez por conexión (no en cada consulta).
+        # journal_mode=WAL queda guardado en el archivo (ver init_db); con WAL,
+        # synchronous=NORMAL evita un fsync por commit y sigue siendo seguro
+        # ante cortes de luz.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")  # 64 MB
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        conn.execute("PRAGMA foreign_keys=ON")
+        if SQL_DEBUG:
+            conn.set_trace_callback(_trazar_sql)
+        return conn
+    
+    def _acquire(self):
+        """Toma una conexión de lectura libre del pool o crea una nueva"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._create_connection(solo_lectura=True)
+    
+    def _release(self, conn):
+        """Devuelve la conexión de lectura al pool, o la cierra si el pool está lleno"""
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    
+    def close_all(self):
+        """Cierra la conexión de escritura y las conexiones de lectura inactivas"""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
     @contextmanager
-    def get_connection(self):
+    def get_connection(self, transaccion=True):
         """
-        Context manager para obtener una conexión a la base de datos.
-        Maneja automáticamente commit/rollback y cierre de conexión.
+        Context manager para obtener la conexión de escritura.
+        Toma el lock de escritura y maneja automáticamente commit/rollback.
+        
+        Abre la transacción con BEGIN IMMEDIATE: el bloqueo de escritura de
+        SQLite se toma al inicio, así que la transacción no falla a mitad de
+        camino por otro escritor (otro proceso) y todo el bloque es un solo commit.
+        
+        Args:
+            transaccion (bool): False para sentencias que no pueden correr
+                dentro de una transacción (PRAGMA journal_mode, executescript)
         
         Uso:
             with db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM tabla")
+                conn.execute("UPDATE tabla SET ...")
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._create_connection()
+            conn = self._writer
+            if transaccion and not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+                    self.data_version += 1
+                    self._query_cache.cache_clear()
+            except BaseException:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    # Conexión inutilizable: se abrirá otra en el próximo uso
+                    conn.close()
+                    self._writer = None
+                raise
+    
+    @contextmanager
+    def get_read_connection(self):
+        """
+        Context manager para obtener una conexión de solo lectura del pool.
+        No toma el lock de escritura: varias lecturas corren a la vez.
+        
+        Uso:
+            with db.get_read_connection() as conn:
+                cursor = conn.execute("SELECT * FROM tabla")
+        """
+        conn = self._acquire()
         try:
             yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        except BaseException:
+            # BaseException: también cubre generadores cerrados antes de tiempo (GeneratorExit)
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                # Conexión inutilizable: no se devuelve al pool
+                conn.close()
+                raise
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Agrupa varias escrituras en una sola transacción (un solo commit).
+        Si alguna sentencia falla, se revierten todas.
+        
+        Es get_connection() con nombre explícito: la transacción ya empieza
+        con BEGIN IMMEDIATE.
+        No anidar ni llamar a execute_insert/execute_update dentro: usan la
+        misma conexión de escritura y confirmarían la transacción antes de tiempo.
+        
+        Uso:
+            with db.transaction() as conn:
+                conn.execute("UPDATE ...", params)
+                conn.execute("INSERT ...", params)
+        """
+        with self.get_connection() as conn:
+            yield conn
     
     def init_db(self):
         """
         Inicializa la base de datos ejecutando el schema completo.
-        Lee el archivo schema.sql y lo ejecuta solo si es necesario.
-        """
-        # Verificar si la BD ya está inicializada
-        db_exists = Path(self.db_path).exists()
-        
-        if db_exists:
-            # Verificar si las tablas principales existen
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name='produccion_diaria'
-                """)
-                if cursor.fetchone():
-                    # La BD ya está inicializada
-                    return
-        
-        # Si llegamos aquí, necesitamos crear las tablas
-        schema_path = Path(__file__).parent / 'schema.sql'
+        Lee el archivo schema.sql y lo ejecuta solo si PRAGMA user_version
+        es menor que SCHEMA_VERSION (schema.sql es re-ejecutable).
+        """
+        with self.get_connection(transaccion=False) as conn:
+            # WAL es persistente: basta fijarlo una vez por archivo y no en
+            # cada conexión del pool. Permite que las lecturas (historiales,
+            # stock) avancen mientras otra sesión escribe.
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Un archivo recién creado tiene user_version = 0
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
         
-        if not schema_path.exists():
-            raise FileNotFoundError(f"No se encontró el archivo schema.sql en {schema_path}")
+        if version >= SCHEMA_VERSION:
+            # La BD ya está inicializada
+            return
         
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            schema_sql = f.read()
+        # Si llegamos aquí, necesitamos crear o actualizar las tablas
+        schema_sql = _load_schema((Path(__file__).parent / 'schema.sql').resolve())
         
-        with self.get_connection() as conn:
+        with self.get_connection(transaccion=False) as conn:
+            self._migrar_columnas(conn)
             conn.executescript(schema_sql)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         
         print(f"✅ Base de datos inicializada correctamente en {self.db_path}")
     
-    def execute_query(self, query, params=None):
+    def _migrar_columnas(self, conn):
+        """Agrega a las tablas existentes las columnas de COLUMNAS_MIGRADAS que falten"""
+        for tabla, columna, definicion in COLUMNAS_MIGRADAS:
+            # table_xinfo también lista columnas generadas; vacío si la tabla no existe
+            columnas = {fila[1] for fila in conn.execute(f"PRAGMA table_xinfo({tabla})")}
+            if columnas and columna not in columnas:
+                conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+    
+    # Los métodos execute_* ejecutan una única sentencia parametrizada:
+    # sqlite3 rechaza varias sentencias en execute() y guarda el plan de cada
+    # texto SQL en el caché de la conexión, que se reutiliza gracias al pool.
+    # Las lecturas usan el pool de solo lectura; las escrituras, la conexión
+    # de escritura (get_connection).
+    # executescript() queda reservado para schema.sql en init_db().
+    
+    def execute_query(self, query, params=()):
         """
         Ejecuta una consulta SELECT y retorna los resultados.
         
+        Los resultados se memorizan por (query, params) hasta la siguiente
+        escritura; cada llamada recibe sus propios diccionarios.
+        
         Args:
             query (str): Consulta SQL
             params (tuple): Parámetros de la consulta
@@ -90,38 +332,119 @@ class Database:
         Returns:
             list: Lista de resultados como diccionarios
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
+        rows = self._query_cache(query, tuple(params), self.data_version)
+        return [dict(row) for row in rows]
+    
+    def _execute_query_raw(self, query, params, data_version):
+        """
+        Ejecuta la consulta sin caché (usado a través de self._query_cache).
+        data_version forma parte de la clave para que un resultado leído
+        durante una escritura concurrente no se reutilice después de ella.
+        
+        Returns:
+            tuple: Filas sqlite3.Row (inmutables)
+        """
+        with self.get_read_connection() as conn:
+            return tuple(conn.execute(query, params).fetchall())
+    
+    def execute_query_rows(self, query, params=()):
+        """
+        Ejecuta una consulta SELECT y retorna las filas sqlite3.Row sin copiarlas.
+        
+        Más liviano que execute_query: no construye un diccionario por fila.
+        Las filas admiten acceso por nombre (row['columna']) y por índice,
+        pero no .get(); para un DataFrame usar
+        pd.DataFrame(filas, columns=filas[0].keys()).
+        
+        Comparte el caché de execute_query: las filas son inmutables, así que
+        pueden devolverse a varios llamadores sin copiarlas.
+        
+        Args:
+            query (str): Consulta SQL
+            params (tuple): Parámetros de la consulta
             
-            # Convertir Row objects a diccionarios
-            columns = [description[0] for description in cursor.description]
-            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-            return results
+        Returns:
+            list: Lista de objetos sqlite3.Row
+        """
+        return list(self._query_cache(query, tuple(params), self.data_version))
     
-    def execute_insert(self, query, params=None):
+    def execute_queries(self, consultas):
+        """
+        Ejecuta varias consultas SELECT en una sola conexión de lectura y
+        dentro de una misma transacción, de modo que todas ven la misma
+        instantánea de la base de datos.
+        
+        Args:
+            consultas (list): Tuplas (query, params)
+            
+        Returns:
+            list: Una lista de diccionarios por consulta, en el mismo orden
+        """
+        with self.get_read_connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                return [[dict(row) for row in conn.execute(query, params).fetchall()]
+                        for query, params in consultas]
+            finally:
+                conn.rollback()
+    
+    def execute_query_iter(self, query, params=(), chunk=1000):
+        """
+        Ejecuta una consulta SELECT y entrega las filas sqlite3.Row por bloques.
+        
+        La conexión permanece abierta mientras se consume el generador, y solo
+        se mantienen en memoria 'chunk' filas a la vez. No pasa por el caché
+        de execute_query: pensado para exportaciones de períodos largos.
+        
+        Args:
+            query (str): Consulta SQL
+            params (tuple): Parámetros de la consulta
+            chunk (int): Número de filas leídas por bloque (fetchmany)
+            
+        Yields:
+            sqlite3.Row: Cada fila, sin copiarla a un diccionario
+        """
+        with self.get_read_connection() as conn:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    return
+                yield from rows
+    
+    def iter_query(self, query, params=(), chunk=1000):
+        """
+        Igual que execute_query_iter, pero entrega cada fila como diccionario.
+        
+        Uso:
+            df = pd.DataFrame(db.iter_query("SELECT ..."))
+            
+        Yields:
+            dict: Cada fila como diccionario
+        """
+        for row in self.execute_query_iter(query, params, chunk):
+            yield dict(row)
+    
+    def execute_insert(self, query, params=()):
         """
         Ejecuta una consulta INSERT y retorna el ID del registro insertado.
         
+        Se agrega RETURNING id a la consulta (SQLite >= 3.35): el id llega
+        como resultado de la misma sentencia, igual que en otros motores
+        SQL, en lugar de depender de last_insert_rowid. Todas las tablas
+        usan 'id' como clave primaria.
+        
         Args:
-            query (str): Consulta SQL INSERT
+            query (str): Consulta SQL INSERT (sin RETURNING ni ';' final)
             params (tuple): Parámetros de la consulta
             
         Returns:
-            int: ID del último registro insertado
+            int: ID del registro insertado
         """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            return cursor.lastrowid
+            return conn.execute(_sql_con_returning(query), params).fetchone()[0]
     
-    def execute_update(self, query, params=None):
+    def execute_update(self, query, params=()):
         """
         Ejecuta una consulta UPDATE/DELETE y retorna el número de filas afectadas.
         
@@ -133,11 +456,23 @@ class Database:
             int: Número de filas afectadas
         """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
+            cursor = conn.execute(query, params)
+            return cursor.rowcount
+    
+    def execute_many(self, query, params_list):
+        """
+        Ejecuta la misma consulta INSERT/UPDATE para varios registros
+        en una sola conexión y un solo commit.
+        
+        Args:
+            query (str): Consulta SQL INSERT/UPDATE
+            params_list (list): Lista de tuplas de parámetros, una por registro
+            
+        Returns:
+            int: Número total de filas afectadas
+        """
+        with self.get_connection() as conn:
+            cursor = conn.executemany(query, params_list)
             return cursor.rowcount
     
     def reset_database(self):
@@ -145,13 +480,34 @@ class Database:
         PELIGRO: Elimina y recrea la base de datos.
         Usar solo en desarrollo.
         """
-        if Path(self.db_path).exists():
+        self.close_all()
+        try:
             Path(self.db_path).unlink()
             print(f"⚠️  Base de datos eliminada: {self.db_path}")
+        except FileNotFoundError:
+            pass
+        # Restos del modo WAL que no deben aplicarse a la base nueva
+        for sufijo in ('-wal', '-shm'):
+            Path(f"{self.db_path}{sufijo}").unlink(missing_ok=True)
         
         self.init_db()
+        # Los resultados memorizados corresponden a la base eliminada
+        self.data_version += 1
+        self._query_cache.cache_clear()
         print("✅ Base de datos recreada desde cero")
 
 
-# Instancia global de la base de datos
-db = Database()
\ No newline at end of file
+@st.cache_resource(show_spinner=False)
+def get_db():
+    """
+    Retorna la instancia única de la base de datos.
+    
+    st.cache_resource la crea una sola vez por proceso y la comparte entre
+    sesiones y reruns, evitando repetir la verificación del schema. Sin
+    spinner: los módulos la llaman al importarse, antes de st.set_page_config,
+    y el spinner ya contaría como primer comando de Streamlit.
+    
+    Returns:
+        Database: Instancia compartida de la base de datos
+    """
+    return Database()
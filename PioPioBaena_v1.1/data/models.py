@@ -3,17 +3,52 @@ Modelos de repositorio para acceso a datos.
 Cada clase Repository maneja las operaciones CRUD de una tabla específica.
 """
 
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta
+from functools import lru_cache
 from typing import List, Dict, Optional
 
+# Columnas de stock_huevos por categoría, en el orden de los parámetros
+CATEGORIAS_STOCK = ('tipo_c', 'tipo_b', 'tipo_a', 'tipo_aa', 'tipo_aaa', 'tipo_jumbo')
+
+
+@lru_cache(maxsize=None)
+def _query_ajuste_parcial(columnas: tuple) -> str:
+    """
+    UPDATE de stock_huevos solo para las columnas indicadas.
+    Se memoriza por combinación de columnas para que el texto SQL sea
+    siempre el mismo y la sentencia preparada se reutilice.
+    """
+    asignaciones = ", ".join(f"{columna} = {columna} + ?" for columna in columnas)
+    return f"UPDATE stock_huevos SET {asignaciones}, updated_at = CURRENT_TIMESTAMP WHERE id = 1"
+
+
+def _fecha_hora_actual() -> tuple:
+    """Fecha y hora locales (date, time), como las que envían los módulos"""
+    ahora = datetime.now()
+    return ahora.date(), ahora.time()
+
 
 class ProduccionRepository:
     """Repositorio para gestionar la producción diaria de huevos"""
     
+    QUERY_INSERTAR_PRODUCCION = """
+        INSERT INTO produccion_diaria 
+        (fecha, hora, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, observaciones)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    # Una fila por día desde totales_produccion_diaria (mantenida por triggers)
+    QUERY_RESUMEN_DIARIO = """
+        SELECT fecha, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, total
+        FROM totales_produccion_diaria
+        WHERE fecha BETWEEN ? AND ?
+        ORDER BY fecha
+    """
+    
     def __init__(self, db):
         self.db = db
     
-    def registrar_produccion(self, fecha: date, hora: str, 
+    def registrar_produccion(self, fecha: date, hora: time, 
                             tipo_c: int, tipo_b: int, tipo_a: int,
                             tipo_aa: int, tipo_aaa: int, tipo_jumbo: int,
                             observaciones: str = None) -> int:
@@ -22,32 +57,72 @@ class ProduccionRepository:
         El trigger automáticamente actualiza el stock.
         
         Args:
-            hora: Hora en formato string "HH:MM:SS"
+            hora: Hora (datetime.time; se guarda como "HH:MM:SS")
         
         Returns:
             int: ID del registro creado
         """
-        query = """
-            INSERT INTO produccion_diaria 
-            (fecha, hora, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, observaciones)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        return self.db.execute_insert(query, (
+        return self.db.execute_insert(self.QUERY_INSERTAR_PRODUCCION, (
             fecha, hora, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, observaciones
         ))
     
-    def obtener_produccion_por_fecha(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
-        """Obtiene la producción entre dos fechas"""
+    def registrar_produccion_bulk(self, registros: List[tuple]) -> int:
+        """
+        Registra varias producciones en una sola transacción (executemany).
+        El trigger actualiza el stock por cada fila.
+        
+        Args:
+            registros: Tuplas (fecha, hora, tipo_c, tipo_b, tipo_a, tipo_aa,
+                       tipo_aaa, tipo_jumbo, observaciones)
+        
+        Returns:
+            int: Número de registros insertados
+        """
+        return self.db.execute_many(self.QUERY_INSERTAR_PRODUCCION, registros)
+    
+    def obtener_produccion_por_fecha(self, fecha_inicio: date, fecha_fin: date,
+                                     limite: int = -1, offset: int = 0) -> List:
+        """
+        Obtiene la producción entre dos fechas (filas sqlite3.Row), de la más
+        reciente a la más antigua.
+        
+        Args:
+            limite: Máximo de registros (página); -1 = sin límite
+            offset: Registros a saltar desde el más reciente
+        """
         query = """
-            SELECT * FROM produccion_diaria
+            SELECT fecha, hora, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo,
+                   total_huevos as total, observaciones
+            FROM produccion_diaria
             WHERE fecha BETWEEN ? AND ?
-            ORDER BY fecha DESC, hora DESC
+            ORDER BY fecha DESC, hora DESC, id DESC
+            LIMIT ? OFFSET ?
         """
-        return self.db.execute_query(query, (fecha_inicio, fecha_fin))
+        return self.db.execute_query_rows(query, (fecha_inicio, fecha_fin, limite, offset))
+    
+    def obtener_estadisticas_periodo(self, fecha_inicio: date, fecha_fin: date) -> Dict:
+        """Cantidad de registros y total, promedio y máximo por registro en un período"""
+        query = """
+            SELECT 
+                COUNT(*) as registros,
+                COALESCE(SUM(total_huevos), 0) as total,
+                AVG(total_huevos) as promedio,
+                MAX(total_huevos) as maximo
+            FROM produccion_diaria
+            WHERE fecha BETWEEN ? AND ?
+        """
+        result = self.db.execute_query(query, (fecha_inicio, fecha_fin))
+        return result[0] if result else {'registros': 0}
     
     def obtener_produccion_del_dia(self, fecha: date) -> List[Dict]:
         """Obtiene la producción de un día específico"""
-        query = "SELECT * FROM produccion_diaria WHERE fecha = ? ORDER BY hora DESC"
+        query = """
+            SELECT fecha, hora, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo,
+                   total_huevos as total, observaciones
+            FROM produccion_diaria
+            WHERE fecha = ?
+            ORDER BY hora DESC
+        """
         return self.db.execute_query(query, (fecha,))
     
     def obtener_total_produccion_periodo(self, fecha_inicio: date, fecha_fin: date) -> Dict:
@@ -60,24 +135,88 @@ class ProduccionRepository:
                 SUM(tipo_aa) as total_aa,
                 SUM(tipo_aaa) as total_aaa,
                 SUM(tipo_jumbo) as total_jumbo,
-                COUNT(*) as dias_registrados
-            FROM produccion_diaria
+                SUM(registros) as dias_registrados
+            FROM totales_produccion_diaria
             WHERE fecha BETWEEN ? AND ?
         """
         result = self.db.execute_query(query, (fecha_inicio, fecha_fin))
         return result[0] if result else {}
+    
+    def obtener_resumen_diario(self, fecha_inicio: date, fecha_fin: date) -> List:
+        """Obtiene la producción por categoría y el total de cada día del período (filas sqlite3.Row)"""
+        return self.db.execute_query_rows(self.QUERY_RESUMEN_DIARIO, (fecha_inicio, fecha_fin))
 
 
 class StockRepository:
     """Repositorio para gestionar el stock de huevos e insumos"""
     
+    QUERY_ALERTAS_STOCK = """
+        SELECT 
+            si.id,
+            i.nombre,
+            i.categoria,
+            si.cantidad_actual,
+            si.stock_minimo,
+            i.unidad
+        FROM stock_insumos si
+        JOIN insumos i ON si.insumo_id = i.id
+        WHERE si.cantidad_actual <= si.stock_minimo
+        ORDER BY i.categoria, i.nombre
+    """
+    
+    QUERY_STOCK_ACTUAL = """
+        SELECT tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, updated_at
+        FROM stock_huevos WHERE id = 1
+    """
+    
+    QUERY_HISTORIAL_MOVIMIENTOS_INSUMOS = """
+        SELECT 
+            m.*,
+            i.nombre as insumo_nombre,
+            i.categoria,
+            i.unidad
+        FROM movimientos_insumos m
+        JOIN insumos i ON m.insumo_id = i.id
+        WHERE m.fecha BETWEEN ? AND ?
+        ORDER BY m.fecha DESC, m.hora DESC
+    """
+    
+    QUERY_AJUSTAR_STOCK_HUEVOS = """
+        UPDATE stock_huevos 
+        SET tipo_c = tipo_c + ?,
+            tipo_b = tipo_b + ?,
+            tipo_a = tipo_a + ?,
+            tipo_aa = tipo_aa + ?,
+            tipo_aaa = tipo_aaa + ?,
+            tipo_jumbo = tipo_jumbo + ?,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1
+    """
+    
+    QUERY_INSERTAR_AJUSTE_HUEVOS = """
+        INSERT INTO ajustes_stock_huevos 
+        (fecha, hora, tipo_ajuste, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, motivo)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    QUERY_DESCONTAR_INSUMO = """
+        UPDATE stock_insumos 
+        SET cantidad_actual = cantidad_actual - ?
+        WHERE insumo_id = ?
+    """
+    
+    QUERY_INSERTAR_SALIDA_INSUMO = """
+        INSERT INTO movimientos_insumos 
+        (fecha, hora, insumo_id, tipo_movimiento, cantidad, motivo)
+        VALUES (?, ?, ?, 'salida', ?, ?)
+    """
+    
     def __init__(self, db):
         self.db = db
     
     def obtener_stock_actual(self) -> Dict:
         """Obtiene el stock actual de huevos"""
-        query = "SELECT * FROM stock_huevos WHERE id = 1"
-        result = self.db.execute_query(query)
+        result = self.db.execute_query(self.QUERY_STOCK_ACTUAL)
         return result[0] if result else {}
     
     def ajustar_stock_manual(self, tipo_c: int = 0, tipo_b: int = 0, 
@@ -87,19 +226,15 @@ class StockRepository:
         """
         Ajusta el stock manualmente (para mermas, roturas, etc.)
         Valores negativos descuentan, positivos suman.
+        Solo actualiza las categorías con cambios; si no hay ninguno, no escribe.
         """
-        query = """
-            UPDATE stock_huevos 
-            SET tipo_c = tipo_c + ?,
-                tipo_b = tipo_b + ?,
-                tipo_a = tipo_a + ?,
-                tipo_aa = tipo_aa + ?,
-                tipo_aaa = tipo_aaa + ?,
-                tipo_jumbo = tipo_jumbo + ?,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = 1
-        """
-        return self.db.execute_update(query, (tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo))
+        cambios = [(columna, valor) for columna, valor in zip(
+            CATEGORIAS_STOCK, (tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo)
+        ) if valor]
+        if not cambios:
+            return 0
+        columnas, valores = zip(*cambios)
+        return self.db.execute_update(_query_ajuste_parcial(columnas), valores)
     
     def obtener_stock_insumos(self) -> List[Dict]:
         """Obtiene el stock de todos los insumos"""
@@ -124,20 +259,7 @@ class StockRepository:
     
     def obtener_alertas_stock(self) -> List[Dict]:
         """Obtiene insumos con stock bajo"""
-        query = """
-            SELECT 
-                si.id,
-                i.nombre,
-                i.categoria,
-                si.cantidad_actual,
-                si.stock_minimo,
-                i.unidad
-            FROM stock_insumos si
-            JOIN insumos i ON si.insumo_id = i.id
-            WHERE si.cantidad_actual <= si.stock_minimo
-            ORDER BY i.categoria, i.nombre
-        """
-        return self.db.execute_query(query)
+        return self.db.execute_query(self.QUERY_ALERTAS_STOCK)
     
     def registrar_ajuste_huevos(self, tipo_ajuste: str, tipo_c: int = 0, tipo_b: int = 0,
                                 tipo_a: int = 0, tipo_aa: int = 0, tipo_aaa: int = 0,
@@ -149,61 +271,107 @@ class StockRepository:
             tipo_ajuste: 'merma' o 'correccion'
             Los valores pueden ser positivos (corrección al alza) o negativos (mermas)
         """
-        # Primero ajustar el stock
-        self.ajustar_stock_manual(tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, motivo)
+        fecha, hora = _fecha_hora_actual()
         
-        # Registrar el ajuste en una tabla de historial
-        query = """
-            INSERT INTO ajustes_stock_huevos 
-            (fecha, hora, tipo_ajuste, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, motivo)
-            VALUES (date('now'), time('now'), ?, ?, ?, ?, ?, ?, ?, ?)
+        # Ajuste de stock e historial en una misma transacción
+        with self.db.transaction() as conn:
+            conn.execute(self.QUERY_AJUSTAR_STOCK_HUEVOS,
+                         (tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo))
+            cursor = conn.execute(self.QUERY_INSERTAR_AJUSTE_HUEVOS,
+                                  (fecha, hora, tipo_ajuste, tipo_c, tipo_b, tipo_a, tipo_aa,
+                                   tipo_aaa, tipo_jumbo, motivo))
+            return cursor.lastrowid
+    
+    def registrar_ajuste_huevos_bulk(self, ajustes: List[tuple]) -> int:
+        """
+        Registra y aplica varios ajustes de stock de huevos en una sola transacción.
+        
+        Args:
+            ajustes: Tuplas (tipo_ajuste, tipo_c, tipo_b, tipo_a, tipo_aa,
+                     tipo_aaa, tipo_jumbo, motivo)
+        
+        Returns:
+            int: Número de ajustes registrados
         """
-        return self.db.execute_insert(query, (tipo_ajuste, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, motivo))
+        fecha, hora = _fecha_hora_actual()
+        with self.db.transaction() as conn:
+            conn.executemany(self.QUERY_AJUSTAR_STOCK_HUEVOS, [ajuste[1:7] for ajuste in ajustes])
+            return conn.executemany(self.QUERY_INSERTAR_AJUSTE_HUEVOS,
+                                    [(fecha, hora, *ajuste) for ajuste in ajustes]).rowcount
     
     def obtener_historial_ajustes_huevos(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
-        """Obtiene el historial de ajustes de stock de huevos"""
+        """Obtiene el historial de ajustes de stock de huevos, con el total de cada ajuste"""
         query = """
-            SELECT * FROM ajustes_stock_huevos
+            SELECT fecha, hora, tipo_ajuste,
+                   tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo,
+                   (tipo_c + tipo_b + tipo_a + tipo_aa + tipo_aaa + tipo_jumbo) as total,
+                   motivo
+            FROM ajustes_stock_huevos
             WHERE fecha BETWEEN ? AND ?
             ORDER BY fecha DESC, hora DESC
         """
         return self.db.execute_query(query, (fecha_inicio, fecha_fin))
     
+    def obtener_resumen_ajustes(self, fecha_inicio: date, fecha_fin: date) -> Dict:
+        """
+        Cantidad de ajustes y suma de huevos ajustados por tipo de ajuste.
+        
+        Returns:
+            Dict: {tipo_ajuste: {'ajustes': int, 'total': int}}
+        """
+        query = """
+            SELECT 
+                tipo_ajuste,
+                COUNT(*) as ajustes,
+                SUM(tipo_c + tipo_b + tipo_a + tipo_aa + tipo_aaa + tipo_jumbo) as total
+            FROM ajustes_stock_huevos
+            WHERE fecha BETWEEN ? AND ?
+            GROUP BY tipo_ajuste
+        """
+        return {
+            fila['tipo_ajuste']: {'ajustes': fila['ajustes'], 'total': fila['total']}
+            for fila in self.db.execute_query(query, (fecha_inicio, fecha_fin))
+        }
+    
     def registrar_consumo_insumo(self, insumo_id: int, cantidad: float, motivo: str = None) -> int:
         """
         Registra un consumo/salida de insumo y descuenta del stock.
         Cantidad debe ser positiva (se descuenta automáticamente).
         """
-        # Descontar del stock
-        query_update = """
-            UPDATE stock_insumos 
-            SET cantidad_actual = cantidad_actual - ?
-            WHERE insumo_id = ?
+        fecha, hora = _fecha_hora_actual()
+        with self.db.transaction() as conn:
+            # Descontar del stock
+            conn.execute(self.QUERY_DESCONTAR_INSUMO, (cantidad, insumo_id))
+            
+            # Registrar el movimiento
+            cursor = conn.execute(self.QUERY_INSERTAR_SALIDA_INSUMO,
+                                  (fecha, hora, insumo_id, cantidad, motivo))
+            return cursor.lastrowid
+    
+    def registrar_consumo_insumo_bulk(self, consumos: List[tuple]) -> int:
         """
-        self.db.execute_update(query_update, (cantidad, insumo_id))
+        Registra varios consumos de insumos en una sola transacción.
+        
+        Args:
+            consumos: Tuplas (insumo_id, cantidad, motivo)
         
-        # Registrar el movimiento
-        query_insert = """
-            INSERT INTO movimientos_insumos 
-            (fecha, hora, insumo_id, tipo_movimiento, cantidad, motivo)
-            VALUES (date('now'), time('now'), ?, 'salida', ?, ?)
+        Returns:
+            int: Número de movimientos registrados
         """
-        return self.db.execute_insert(query_insert, (insumo_id, cantidad, motivo))
+        fecha, hora = _fecha_hora_actual()
+        with self.db.transaction() as conn:
+            conn.executemany(self.QUERY_DESCONTAR_INSUMO,
+                             [(cantidad, insumo_id) for insumo_id, cantidad, _ in consumos])
+            return conn.executemany(self.QUERY_INSERTAR_SALIDA_INSUMO,
+                                    [(fecha, hora, *consumo) for consumo in consumos]).rowcount
     
-    def obtener_historial_movimientos_insumos(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
-        """Obtiene el historial de movimientos de insumos"""
-        query = """
-            SELECT 
-                m.*,
-                i.nombre as insumo_nombre,
-                i.categoria,
-                i.unidad
-            FROM movimientos_insumos m
-            JOIN insumos i ON m.insumo_id = i.id
-            WHERE m.fecha BETWEEN ? AND ?
-            ORDER BY m.fecha DESC, m.hora DESC
-        """
-        return self.db.execute_query(query, (fecha_inicio, fecha_fin))
+    def obtener_historial_movimientos_insumos(self, fecha_inicio: date, fecha_fin: date) -> List:
+        """Obtiene el historial de movimientos de insumos (filas sqlite3.Row)"""
+        return self.db.execute_query_rows(self.QUERY_HISTORIAL_MOVIMIENTOS_INSUMOS, (fecha_inicio, fecha_fin))
+    
+    def obtener_historial_movimientos_insumos_iter(self, fecha_inicio: date, fecha_fin: date):
+        """Igual que obtener_historial_movimientos_insumos, pero como generador de filas"""
+        return self.db.execute_query_iter(self.QUERY_HISTORIAL_MOVIMIENTOS_INSUMOS, (fecha_inicio, fecha_fin))
     
     def ajustar_stock_insumo(self, insumo_id: int, nueva_cantidad: float, motivo: str = "Ajuste manual") -> int:
         """Ajusta el stock de un insumo a una cantidad específica"""
@@ -243,7 +411,7 @@ class ClientesRepository:
     
     def obtener_cliente(self, cliente_id: int) -> Dict:
         """Obtiene un cliente específico"""
-        query = "SELECT * FROM clientes WHERE id = ?"
+        query = "SELECT id, nombre, contacto, activo FROM clientes WHERE id = ?"
         result = self.db.execute_query(query, (cliente_id,))
         return result[0] if result else {}
     
@@ -262,8 +430,7 @@ class ClientesRepository:
         query = """
             SELECT 
                 p.*,
-                (p.cantidad_c + p.cantidad_b + p.cantidad_a + 
-                 p.cantidad_aa + p.cantidad_aaa + p.cantidad_jumbo) as total_huevos
+                p.total_canastillas * 30 as total_huevos
             FROM pedidos p
             WHERE p.cliente_id = ?
             ORDER BY p.fecha DESC, p.hora DESC
@@ -302,13 +469,14 @@ class TrabajadoresRepository:
 class PreciosRepository:
     """Repositorio para gestionar precios de huevos"""
     
+    QUERY_PRECIO_ACTUAL = "SELECT * FROM precios_huevos WHERE activo = 1"
+    
     def __init__(self, db):
         self.db = db
     
     def obtener_precio_actual(self) -> Dict:
         """Obtiene el precio activo actual"""
-        query = "SELECT * FROM precios_huevos WHERE activo = 1"
-        result = self.db.execute_query(query)
+        result = self.db.execute_query(self.QUERY_PRECIO_ACTUAL)
         return result[0] if result else {}
     
     def crear_nuevo_precio(self, fecha_vigencia: date,
@@ -328,46 +496,103 @@ class PreciosRepository:
     
     def obtener_historial_precios(self, limit: int = 10) -> List[Dict]:
         """Obtiene el historial de precios (limitado)"""
-        query = f"SELECT * FROM precios_huevos ORDER BY fecha_vigencia DESC LIMIT {limit}"
-        return self.db.execute_query(query)
+        query = "SELECT * FROM precios_huevos ORDER BY fecha_vigencia DESC LIMIT ?"
+        return self.db.execute_query(query, (limit,))
 
 class PedidosRepository:
     """Repositorio para gestionar pedidos y despachos"""
     
+    QUERY_PEDIDOS_PENDIENTES = """
+        SELECT 
+            p.id, p.fecha, p.hora,
+            p.canastillas_c, p.canastillas_b, p.canastillas_a,
+            p.canastillas_aa, p.canastillas_aaa, p.canastillas_jumbo,
+            p.precio_total, p.observaciones,
+            c.nombre as cliente_nombre,
+            c.contacto as cliente_contacto,
+            p.total_canastillas
+        FROM pedidos p
+        JOIN clientes c ON p.cliente_id = c.id
+        WHERE p.estado = 'pendiente'
+        ORDER BY p.fecha ASC, p.hora ASC
+    """
+    
+    QUERY_HISTORIAL_VENTAS = """
+        SELECT 
+            p.id, p.fecha, p.hora,
+            p.canastillas_c, p.canastillas_b, p.canastillas_a,
+            p.canastillas_aa, p.canastillas_aaa, p.canastillas_jumbo,
+            p.precio_total, p.observaciones,
+            c.nombre as cliente_nombre,
+            d.fecha as fecha_despacho,
+            d.hora as hora_despacho,
+            p.total_canastillas
+        FROM pedidos p
+        JOIN clientes c ON p.cliente_id = c.id
+        LEFT JOIN despachos d ON p.id = d.pedido_id
+        WHERE p.estado = 'completado' 
+        AND p.fecha BETWEEN ? AND ?
+        ORDER BY p.fecha DESC, p.hora DESC, p.id DESC
+    """
+    
+    # Misma consulta, por páginas (LIMIT -1 = sin límite)
+    QUERY_HISTORIAL_VENTAS_PAGINA = QUERY_HISTORIAL_VENTAS + """
+        LIMIT ? OFFSET ?
+    """
+    
+    QUERY_INSERTAR_PEDIDO = """
+        INSERT INTO pedidos 
+        (cliente_id, fecha, hora, canastillas_c, canastillas_b, canastillas_a, 
+         canastillas_aa, canastillas_aaa, canastillas_jumbo, precio_total, observaciones)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    QUERY_INSERTAR_DESPACHO = """
+        INSERT INTO despachos 
+        (pedido_id, fecha, hora, canastillas_c, canastillas_b, canastillas_a,
+         canastillas_aa, canastillas_aaa, canastillas_jumbo, observaciones)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
     def __init__(self, db):
         self.db = db
     
-    def crear_pedido(self, cliente_id: int, fecha: date, hora: str,
+    def crear_pedido(self, cliente_id: int, fecha: date, hora: time,
                     canastillas_c: int, canastillas_b: int, canastillas_a: int,
                     canastillas_aa: int, canastillas_aaa: int, canastillas_jumbo: int,
                     precio_total: float, observaciones: str = None) -> int:
         """Crea un nuevo pedido (en canastillas)"""
-        query = """
-            INSERT INTO pedidos 
-            (cliente_id, fecha, hora, canastillas_c, canastillas_b, canastillas_a, 
-             canastillas_aa, canastillas_aaa, canastillas_jumbo, precio_total, observaciones)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        return self.db.execute_insert(query, (
+        return self.db.execute_insert(self.QUERY_INSERTAR_PEDIDO, (
             cliente_id, fecha, hora, canastillas_c, canastillas_b, canastillas_a,
             canastillas_aa, canastillas_aaa, canastillas_jumbo, precio_total, observaciones
         ))
     
+    def crear_y_despachar_pedido(self, cliente_id: int, fecha: date, hora: time,
+                                 canastillas_c: int, canastillas_b: int, canastillas_a: int,
+                                 canastillas_aa: int, canastillas_aaa: int, canastillas_jumbo: int,
+                                 precio_total: float, observaciones: str = None,
+                                 observaciones_despacho: str = None) -> int:
+        """
+        Crea un pedido y lo despacha en la misma transacción:
+        si el despacho falla, el pedido tampoco queda registrado.
+        
+        Returns:
+            int: ID del pedido creado
+        """
+        canastillas = (canastillas_c, canastillas_b, canastillas_a,
+                       canastillas_aa, canastillas_aaa, canastillas_jumbo)
+        with self.db.transaction() as conn:
+            pedido_id = conn.execute(self.QUERY_INSERTAR_PEDIDO, (
+                cliente_id, fecha, hora, *canastillas, precio_total, observaciones
+            )).lastrowid
+            conn.execute(self.QUERY_INSERTAR_DESPACHO, (
+                pedido_id, fecha, hora, *canastillas, observaciones_despacho
+            ))
+        return pedido_id
+    
     def obtener_pedidos_pendientes(self) -> List[Dict]:
         """Obtiene todos los pedidos pendientes con datos del cliente"""
-        query = """
-            SELECT 
-                p.*,
-                c.nombre as cliente_nombre,
-                c.contacto as cliente_contacto,
-                (p.canastillas_c + p.canastillas_b + p.canastillas_a + 
-                 p.canastillas_aa + p.canastillas_aaa + p.canastillas_jumbo) as total_canastillas
-            FROM pedidos p
-            JOIN clientes c ON p.cliente_id = c.id
-            WHERE p.estado = 'pendiente'
-            ORDER BY p.fecha ASC, p.hora ASC
-        """
-        return self.db.execute_query(query)
+        return self.db.execute_query(self.QUERY_PEDIDOS_PENDIENTES)
     
     def obtener_pedido(self, pedido_id: int) -> Dict:
         """Obtiene un pedido específico con datos del cliente"""
@@ -404,7 +629,7 @@ class PedidosRepository:
         query = "UPDATE pedidos SET estado = 'cancelado' WHERE id = ?"
         return self.db.execute_update(query, (pedido_id,))
     
-    def despachar_pedido(self, pedido_id: int, fecha: date, hora: str,
+    def despachar_pedido(self, pedido_id: int, fecha: date, hora: time,
                         canastillas_c: int, canastillas_b: int, canastillas_a: int,
                         canastillas_aa: int, canastillas_aaa: int, canastillas_jumbo: int,
                         observaciones: str = None) -> int:
@@ -414,40 +639,57 @@ class PedidosRepository:
         - Descuenta el stock (canastillas * 30)
         - Marca el pedido como completado
         - Registra el ingreso
+        Todo ocurre dentro de una única transacción.
         """
-        query = """
-            INSERT INTO despachos 
-            (pedido_id, fecha, hora, canastillas_c, canastillas_b, canastillas_a,
-             canastillas_aa, canastillas_aaa, canastillas_jumbo, observaciones)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        with self.db.transaction() as conn:
+            cursor = conn.execute(self.QUERY_INSERTAR_DESPACHO, (
+                pedido_id, fecha, hora, canastillas_c, canastillas_b, canastillas_a,
+                canastillas_aa, canastillas_aaa, canastillas_jumbo, observaciones
+            ))
+            return cursor.lastrowid
+    
+    def obtener_historial_ventas(self, fecha_inicio: date, fecha_fin: date,
+                                 limite: int = -1, offset: int = 0) -> List:
         """
-        return self.db.execute_insert(query, (
-            pedido_id, fecha, hora, canastillas_c, canastillas_b, canastillas_a,
-            canastillas_aa, canastillas_aaa, canastillas_jumbo, observaciones
-        ))
-    
-    def obtener_historial_ventas(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
-        """Obtiene el historial de ventas completadas en un período"""
-        query = """
-            SELECT 
-                p.*,
-                c.nombre as cliente_nombre,
-                d.fecha as fecha_despacho,
-                d.hora as hora_despacho,
-                (p.canastillas_c + p.canastillas_b + p.canastillas_a + 
-                 p.canastillas_aa + p.canastillas_aaa + p.canastillas_jumbo) as total_canastillas
-            FROM pedidos p
-            JOIN clientes c ON p.cliente_id = c.id
-            LEFT JOIN despachos d ON p.id = d.pedido_id
-            WHERE p.estado = 'completado' 
-            AND p.fecha BETWEEN ? AND ?
-            ORDER BY p.fecha DESC
+        Obtiene el historial de ventas completadas en un período (filas
+        sqlite3.Row), de la más reciente a la más antigua.
+        
+        Args:
+            limite: Máximo de ventas (página); -1 = sin límite
+            offset: Ventas a saltar desde la más reciente
         """
-        return self.db.execute_query(query, (fecha_inicio, fecha_fin))
+        return self.db.execute_query_rows(self.QUERY_HISTORIAL_VENTAS_PAGINA,
+                                          (fecha_inicio, fecha_fin, limite, offset))
+    
+    def obtener_historial_ventas_iter(self, fecha_inicio: date, fecha_fin: date):
+        """Igual que obtener_historial_ventas, pero como generador de filas (exportaciones)"""
+        return self.db.execute_query_iter(self.QUERY_HISTORIAL_VENTAS, (fecha_inicio, fecha_fin))
 
 class InsumosRepository:
     """Repositorio para gestionar insumos y pagos"""
     
+    QUERY_INSERTAR_COMPRA = """
+        INSERT INTO insumos 
+        (nombre, categoria, cantidad, unidad, costo_unitario, costo_total, fecha_compra, proveedor)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    # ?4/?5 delimitan los meses completos ('YYYY-MM-DD', se compara el mes)
+    QUERY_TOTAL_PAGOS_TRABAJADOR = """
+        SELECT 
+            COALESCE((
+                SELECT SUM(total)
+                FROM totales_pagos_trabajador_mes
+                WHERE trabajador_id = ?1
+                  AND mes >= substr(?4, 1, 7) AND mes < substr(?5, 1, 7)
+            ), 0) + COALESCE((
+                SELECT SUM(monto)
+                FROM pagos_trabajadores
+                WHERE trabajador_id = ?1 AND fecha BETWEEN ?2 AND ?3
+                  AND (fecha < ?4 OR fecha >= ?5)
+            ), 0) as total
+    """
+    
     def __init__(self, db):
         self.db = db
     
@@ -458,15 +700,24 @@ class InsumosRepository:
         Registra una compra de insumo.
         El trigger automáticamente registra el egreso y actualiza el stock.
         """
-        query = """
-            INSERT INTO insumos 
-            (nombre, categoria, cantidad, unidad, costo_unitario, costo_total, fecha_compra, proveedor)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        return self.db.execute_insert(query, (
+        return self.db.execute_insert(self.QUERY_INSERTAR_COMPRA, (
             nombre, categoria, cantidad, unidad, costo_unitario, costo_total, fecha_compra, proveedor
         ))
     
+    def registrar_compra_insumo_bulk(self, compras: List[tuple]) -> int:
+        """
+        Registra varias compras de insumos en una sola transacción (executemany).
+        Los triggers registran el egreso y actualizan el stock por cada fila.
+        
+        Args:
+            compras: Tuplas (nombre, categoria, cantidad, unidad, costo_unitario,
+                     costo_total, fecha_compra, proveedor)
+        
+        Returns:
+            int: Número de compras registradas
+        """
+        return self.db.execute_many(self.QUERY_INSERTAR_COMPRA, compras)
+    
     def obtener_historial_compras(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
         """Obtiene el historial de compras en un período"""
         query = """
@@ -490,7 +741,7 @@ class InsumosRepository:
         """
         return self.db.execute_query(query, (fecha_inicio, fecha_fin))
     
-    def registrar_pago_trabajador(self, trabajador_id: int, fecha: date, hora: str,
+    def registrar_pago_trabajador(self, trabajador_id: int, fecha: date, hora: time,
                                  monto: float, concepto: str = None) -> int:
         """
         Registra un pago a trabajador.
@@ -526,32 +777,88 @@ class InsumosRepository:
         return self.db.execute_query(query, (trabajador_id, fecha_inicio, fecha_fin))
     
     def obtener_total_pagos_trabajador(self, trabajador_id: int, fecha_inicio: date, fecha_fin: date) -> float:
-        """Obtiene el total pagado a un trabajador en un período"""
-        query = """
-            SELECT COALESCE(SUM(monto), 0) as total
-            FROM pagos_trabajadores
-            WHERE trabajador_id = ? AND fecha BETWEEN ? AND ?
         """
-        result = self.db.execute_query(query, (trabajador_id, fecha_inicio, fecha_fin))
+        Obtiene el total pagado a un trabajador en un período.
+        Los meses completos salen de totales_pagos_trabajador_mes; solo los
+        días sueltos de los bordes se suman desde pagos_trabajadores.
+        """
+        if isinstance(fecha_inicio, str):
+            fecha_inicio = date.fromisoformat(fecha_inicio)
+        if isinstance(fecha_fin, str):
+            fecha_fin = date.fromisoformat(fecha_fin)
+        
+        # [inicio_completo, fin_completo) = meses enteros dentro del período.
+        # Si no hay ninguno, inicio_completo >= fin_completo y todo el rango
+        # cae en la consulta de bordes.
+        inicio_completo = fecha_inicio.replace(day=1)
+        if fecha_inicio.day != 1:
+            inicio_completo = (inicio_completo + timedelta(days=31)).replace(day=1)
+        fin_completo = (fecha_fin + timedelta(days=1)).replace(day=1)
+        
+        result = self.db.execute_query_rows(self.QUERY_TOTAL_PAGOS_TRABAJADOR, (
+            trabajador_id, fecha_inicio.isoformat(), fecha_fin.isoformat(),
+            inicio_completo.isoformat(), fin_completo.isoformat()
+        ))
         return result[0]['total'] if result else 0
 
 class ReportesRepository:
     """Repositorio para generar reportes y análisis"""
     
+    QUERY_ESTADISTICAS_STOCK = """
+        SELECT 
+            (tipo_c + tipo_b + tipo_a + tipo_aa + tipo_aaa + tipo_jumbo) as total_huevos,
+            tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo
+        FROM stock_huevos
+        WHERE id = 1
+    """
+    
+    # Las consultas por período leen las tablas totales_* (una fila por día,
+    # mantenidas por triggers en schema.sql) en lugar de agrupar las tablas base
+    QUERY_PRODUCCION_DIARIA_PERIODO = ProduccionRepository.QUERY_RESUMEN_DIARIO
+    
+    QUERY_TODOS_MOVIMIENTOS = """
+        SELECT * FROM movimientos_financieros
+        WHERE fecha BETWEEN ? AND ?
+        ORDER BY fecha DESC, created_at DESC
+    """
+    
+    # Consultas compartidas entre la versión síncrona y la asíncrona
+    QUERY_BALANCE_PERIODO = """
+        SELECT 
+            SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END) as total_ingresos,
+            SUM(CASE WHEN tipo = 'egreso' THEN monto ELSE 0 END) as total_egresos,
+            SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE -monto END) as balance
+        FROM movimientos_financieros
+        WHERE fecha BETWEEN ? AND ?
+    """
+    
+    # ?1/?2 numerados: ambas subconsultas comparten el mismo período
+    QUERY_RESUMEN_PRODUCCION_VENTAS = """
+        SELECT 
+            (SELECT SUM(total) 
+             FROM totales_produccion_diaria WHERE fecha BETWEEN ?1 AND ?2) as total_producido,
+            (SELECT SUM(total_canastillas) * 30
+             FROM totales_ventas_diarias WHERE fecha BETWEEN ?1 AND ?2) as total_vendido
+    """
+    
+    QUERY_COSTO_PRODUCCION = """
+        SELECT 
+            (SELECT SUM(monto)
+             FROM movimientos_financieros
+             WHERE tipo = 'egreso' 
+             AND fecha BETWEEN ?1 AND ?2
+             AND categoria_grupo IN ('alimento', 'trabajador')) as total_egresos,
+            (SELECT SUM(total)
+             FROM totales_produccion_diaria
+             WHERE fecha BETWEEN ?1 AND ?2) as total_producido
+    """
+    
     def __init__(self, db):
         self.db = db
     
     def obtener_balance_periodo(self, fecha_inicio: date, fecha_fin: date) -> Dict:
         """Obtiene el balance financiero de un período"""
-        query = """
-            SELECT 
-                SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE 0 END) as total_ingresos,
-                SUM(CASE WHEN tipo = 'egreso' THEN monto ELSE 0 END) as total_egresos,
-                SUM(CASE WHEN tipo = 'ingreso' THEN monto ELSE -monto END) as balance
-            FROM movimientos_financieros
-            WHERE fecha BETWEEN ? AND ?
-        """
-        result = self.db.execute_query(query, (fecha_inicio, fecha_fin))
+        result = self.db.execute_query(self.QUERY_BALANCE_PERIODO, (fecha_inicio, fecha_fin))
         return result[0] if result else {}
     
     def obtener_movimientos_por_categoria(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
@@ -569,80 +876,54 @@ class ReportesRepository:
         """
         return self.db.execute_query(query, (fecha_inicio, fecha_fin))
     
-    def obtener_todos_movimientos(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
-        """Obtiene todos los movimientos de un período"""
-        query = """
-            SELECT * FROM movimientos_financieros
-            WHERE fecha BETWEEN ? AND ?
-            ORDER BY fecha DESC, created_at DESC
-        """
-        return self.db.execute_query(query, (fecha_inicio, fecha_fin))
+    def obtener_todos_movimientos(self, fecha_inicio: date, fecha_fin: date) -> List:
+        """Obtiene todos los movimientos de un período (filas sqlite3.Row)"""
+        return self.db.execute_query_rows(self.QUERY_TODOS_MOVIMIENTOS, (fecha_inicio, fecha_fin))
+    
+    def obtener_todos_movimientos_iter(self, fecha_inicio: date, fecha_fin: date):
+        """Igual que obtener_todos_movimientos, pero como generador de filas (exportaciones)"""
+        return self.db.execute_query_iter(self.QUERY_TODOS_MOVIMIENTOS, (fecha_inicio, fecha_fin))
     
     def obtener_resumen_produccion_ventas(self, fecha_inicio: date, fecha_fin: date) -> Dict:
         """Obtiene un resumen comparativo de producción vs ventas"""
-        query = """
-            SELECT 
-                (SELECT SUM(tipo_c + tipo_b + tipo_a + tipo_aa + tipo_aaa + tipo_jumbo) 
-                 FROM produccion_diaria WHERE fecha BETWEEN ? AND ?) as total_producido,
-                (SELECT SUM((canastillas_c + canastillas_b + canastillas_a + 
-                            canastillas_aa + canastillas_aaa + canastillas_jumbo) * 30)
-                 FROM pedidos WHERE estado = 'completado' AND fecha BETWEEN ? AND ?) as total_vendido
-        """
-        result = self.db.execute_query(query, (fecha_inicio, fecha_fin, fecha_inicio, fecha_fin))
+        result = self.db.execute_query(self.QUERY_RESUMEN_PRODUCCION_VENTAS,
+                                       (fecha_inicio, fecha_fin))
         return result[0] if result else {}
     
     def obtener_produccion_diaria_periodo(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
         """Obtiene la producción diaria agregada por fecha"""
-        query = """
-            SELECT 
-                fecha,
-                SUM(tipo_c) as tipo_c,
-                SUM(tipo_b) as tipo_b,
-                SUM(tipo_a) as tipo_a,
-                SUM(tipo_aa) as tipo_aa,
-                SUM(tipo_aaa) as tipo_aaa,
-                SUM(tipo_jumbo) as tipo_jumbo,
-                SUM(tipo_c + tipo_b + tipo_a + tipo_aa + tipo_aaa + tipo_jumbo) as total
-            FROM produccion_diaria
-            WHERE fecha BETWEEN ? AND ?
-            GROUP BY fecha
-            ORDER BY fecha
-        """
-        return self.db.execute_query(query, (fecha_inicio, fecha_fin))
+        return self.db.execute_query(self.QUERY_PRODUCCION_DIARIA_PERIODO, (fecha_inicio, fecha_fin))
+    
+    def obtener_produccion_diaria_periodo_iter(self, fecha_inicio: date, fecha_fin: date):
+        """Igual que obtener_produccion_diaria_periodo, pero como generador de filas (exportaciones)"""
+        return self.db.execute_query_iter(self.QUERY_PRODUCCION_DIARIA_PERIODO, (fecha_inicio, fecha_fin))
     
     def obtener_ventas_diarias_periodo(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
         """Obtiene las ventas diarias agregadas por fecha"""
         query = """
-            SELECT 
-                fecha,
-                COUNT(*) as cantidad_ventas,
-                SUM(canastillas_c + canastillas_b + canastillas_a + 
-                    canastillas_aa + canastillas_aaa + canastillas_jumbo) as total_canastillas,
-                SUM(precio_total) as total_ingresos
-            FROM pedidos
-            WHERE estado = 'completado' AND fecha BETWEEN ? AND ?
-            GROUP BY fecha
+            SELECT fecha, cantidad_ventas, total_canastillas, total_ingresos
+            FROM totales_ventas_diarias
+            WHERE fecha BETWEEN ? AND ?
             ORDER BY fecha
         """
         return self.db.execute_query(query, (fecha_inicio, fecha_fin))
     
     def obtener_top_clientes(self, fecha_inicio: date, fecha_fin: date, limit: int = 10) -> List[Dict]:
         """Obtiene los top clientes por compras"""
-        query = f"""
+        query = """
             SELECT 
                 c.nombre,
                 COUNT(p.id) as cantidad_compras,
                 SUM(p.precio_total) as total_comprado,
-                SUM(p.canastillas_c + p.canastillas_b + p.canastillas_a + 
-                    p.canastillas_aa + p.canastillas_aaa + p.canastillas_jumbo) as total_canastillas
+                SUM(p.total_canastillas) as total_canastillas
             FROM pedidos p
             JOIN clientes c ON p.cliente_id = c.id
             WHERE p.estado = 'completado' AND p.fecha BETWEEN ? AND ?
             GROUP BY c.id, c.nombre
             ORDER BY total_comprado DESC
-            LIMIT {limit}
+            LIMIT ?
         """
-        return self.db.execute_query(query, (fecha_inicio, fecha_fin))
+        return self.db.execute_query(query, (fecha_inicio, fecha_fin, limit))
     
     def obtener_ventas_por_categoria(self, fecha_inicio: date, fecha_fin: date) -> Dict:
         """Obtiene el total de canastillas vendidas por categoría"""
@@ -665,84 +946,112 @@ class ReportesRepository:
         Calcula el costo de producción por huevo.
         Costo = (Total egresos en alimento + salarios) / Total huevos producidos
         """
-        # Obtener egresos relacionados con producción
-        query_egresos = """
-            SELECT SUM(monto) as total_egresos
-            FROM movimientos_financieros
-            WHERE tipo = 'egreso' 
-            AND fecha BETWEEN ? AND ?
-            AND (categoria LIKE '%Alimento%' OR categoria LIKE '%trabajador%')
-        """
-        egresos = self.db.execute_query(query_egresos, (fecha_inicio, fecha_fin))
-        total_egresos = egresos[0]['total_egresos'] if egresos and egresos[0]['total_egresos'] else 0
-        
-        # Obtener producción total
-        query_produccion = """
-            SELECT SUM(tipo_c + tipo_b + tipo_a + tipo_aa + tipo_aaa + tipo_jumbo) as total
-            FROM produccion_diaria
-            WHERE fecha BETWEEN ? AND ?
-        """
-        produccion = self.db.execute_query(query_produccion, (fecha_inicio, fecha_fin))
-        total_producido = produccion[0]['total'] if produccion and produccion[0]['total'] else 0
+        # Egresos relacionados con producción y huevos producidos, en una consulta
+        fila = self.db.execute_query_rows(self.QUERY_COSTO_PRODUCCION, (fecha_inicio, fecha_fin))[0]
+        total_egresos = fila['total_egresos'] or 0
+        total_producido = fila['total_producido'] or 0
         
         if total_producido > 0:
             return total_egresos / total_producido
         else:
             return 0
     
+    def obtener_dashboard_inicial(self) -> Dict:
+        """
+        Obtiene en una sola lectura (misma conexión y misma instantánea) los
+        datos del encabezado de reportes: stock, precio vigente, pedidos
+        pendientes, alertas de insumos y estadísticas del stock.
+        """
+        stock, precio, pendientes, alertas, estadisticas = self.db.execute_queries([
+            (StockRepository.QUERY_STOCK_ACTUAL, ()),
+            (PreciosRepository.QUERY_PRECIO_ACTUAL, ()),
+            (PedidosRepository.QUERY_PEDIDOS_PENDIENTES, ()),
+            (StockRepository.QUERY_ALERTAS_STOCK, ()),
+            (self.QUERY_ESTADISTICAS_STOCK, ()),
+        ])
+        return {
+            'stock': stock[0] if stock else {},
+            'precio': precio[0] if precio else {},
+            'pendientes': pendientes,
+            'alertas': alertas,
+            'estadisticas_stock': estadisticas[0] if estadisticas else {},
+        }
+    
     def obtener_estadisticas_stock(self) -> Dict:
         """Obtiene estadísticas del stock actual"""
-        query = """
-            SELECT 
-                (tipo_c + tipo_b + tipo_a + tipo_aa + tipo_aaa + tipo_jumbo) as total_huevos,
-                tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo
-            FROM stock_huevos
-            WHERE id = 1
-        """
-        result = self.db.execute_query(query)
+        result = self.db.execute_query(self.QUERY_ESTADISTICAS_STOCK)
         return result[0] if result else {}
     
 class GallinasRepository:
     """Repositorio para gestionar población de gallinas y consumo de alimento"""
     
+    QUERY_INSERTAR_POBLACION = """
+        INSERT INTO poblacion_gallinas (fecha, hora, cantidad_gallinas, descartes, observaciones)
+        VALUES (?, ?, ?, ?, ?)
+    """
+    
+    QUERY_INSERTAR_CONSUMO = """
+        INSERT INTO consumo_alimento 
+        (fecha, hora, consumo_por_gallina, cantidad_gallinas, consumo_total, observaciones)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    
     def __init__(self, db):
         self.db = db
     
-    def registrar_poblacion(self, fecha: date, hora: str, cantidad_gallinas: int, 
+    def registrar_poblacion(self, fecha: date, hora: time, cantidad_gallinas: int, 
                            descartes: int = 0, observaciones: str = None) -> int:
         """Registra la población de gallinas"""
-        query = """
-            INSERT INTO poblacion_gallinas (fecha, hora, cantidad_gallinas, descartes, observaciones)
-            VALUES (?, ?, ?, ?, ?)
-        """
-        return self.db.execute_insert(query, (fecha, hora, cantidad_gallinas, descartes, observaciones))
+        return self.db.execute_insert(self.QUERY_INSERTAR_POBLACION,
+                                      (fecha, hora, cantidad_gallinas, descartes, observaciones))
     
     def obtener_poblacion_actual(self) -> Dict:
         """Obtiene el último registro de población"""
         query = """
-            SELECT * FROM poblacion_gallinas 
+            SELECT fecha, hora, cantidad_gallinas, descartes
+            FROM poblacion_gallinas 
             ORDER BY fecha DESC, hora DESC 
             LIMIT 1
         """
         result = self.db.execute_query(query)
         return result[0] if result else {'cantidad_gallinas': 0}
     
-    def registrar_consumo_alimento(self, fecha: date, hora: str, 
+    def registrar_consumo_alimento(self, fecha: date, hora: time, 
                                   consumo_por_gallina: float, cantidad_gallinas: int,
                                   observaciones: str = None) -> int:
         """Registra el consumo de alimento del día"""
         consumo_total = consumo_por_gallina * cantidad_gallinas
-        query = """
-            INSERT INTO consumo_alimento 
-            (fecha, hora, consumo_por_gallina, cantidad_gallinas, consumo_total, observaciones)
-            VALUES (?, ?, ?, ?, ?, ?)
+        return self.db.execute_insert(self.QUERY_INSERTAR_CONSUMO, (
+            fecha, hora, consumo_por_gallina, cantidad_gallinas, consumo_total, observaciones
+        ))
+    
+    def registrar_poblacion_y_consumo(self, fecha: date, hora: time, cantidad_gallinas: int,
+                                      descartes: int, consumo_por_gallina: float,
+                                      observaciones_poblacion: str = None,
+                                      observaciones_consumo: str = None) -> tuple:
         """
-        return self.db.execute_insert(query, (fecha, hora, consumo_por_gallina, cantidad_gallinas, consumo_total, observaciones))
+        Registra la población y el consumo de alimento del día en una sola
+        transacción (un único commit). El consumo se calcula con la población
+        que se está registrando.
+        
+        Returns:
+            tuple: (id de población, id de consumo)
+        """
+        consumo_total = consumo_por_gallina * cantidad_gallinas
+        with self.db.transaction() as conn:
+            poblacion_id = conn.execute(self.QUERY_INSERTAR_POBLACION, (
+                fecha, hora, cantidad_gallinas, descartes, observaciones_poblacion
+            )).lastrowid
+            consumo_id = conn.execute(self.QUERY_INSERTAR_CONSUMO, (
+                fecha, hora, consumo_por_gallina, cantidad_gallinas, consumo_total, observaciones_consumo
+            )).lastrowid
+        return poblacion_id, consumo_id
     
     def obtener_historial_poblacion(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
         """Obtiene el historial de población"""
         query = """
-            SELECT * FROM poblacion_gallinas
+            SELECT fecha, hora, cantidad_gallinas, descartes, observaciones
+            FROM poblacion_gallinas
             WHERE fecha BETWEEN ? AND ?
             ORDER BY fecha DESC, hora DESC
         """
@@ -751,7 +1060,8 @@ class GallinasRepository:
     def obtener_historial_consumo(self, fecha_inicio: date, fecha_fin: date) -> List[Dict]:
         """Obtiene el historial de consumo"""
         query = """
-            SELECT * FROM consumo_alimento
+            SELECT fecha, hora, consumo_por_gallina, cantidad_gallinas, consumo_total, observaciones
+            FROM consumo_alimento
             WHERE fecha BETWEEN ? AND ?
             ORDER BY fecha DESC, hora DESC
         """
@@ -15,7 +15,8 @@ CREATE TABLE IF NOT EXISTS produccion_diaria (
     tipo_aaa INTEGER DEFAULT 0,
     tipo_jumbo INTEGER DEFAULT 0,
     observaciones TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total_huevos INTEGER GENERATED ALWAYS AS (tipo_c + tipo_b + tipo_a + tipo_aa + tipo_aaa + tipo_jumbo) VIRTUAL
 );
 
 -- Tabla de stock actual de huevos
@@ -105,6 +106,8 @@ CREATE TABLE IF NOT EXISTS pedidos (
     estado TEXT DEFAULT 'pendiente' CHECK(estado IN ('pendiente', 'completado', 'cancelado')),
     observaciones TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total_canastillas INTEGER GENERATED ALWAYS AS (canastillas_c + canastillas_b + canastillas_a + 
+                                                   canastillas_aa + canastillas_aaa + canastillas_jumbo) VIRTUAL,
     FOREIGN KEY (cliente_id) REFERENCES clientes(id)
 );
 
@@ -171,23 +174,51 @@ CREATE TABLE IF NOT EXISTS movimientos_financieros (
     descripcion TEXT,
     referencia_id INTEGER,
     referencia_tabla TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Grupo de costo de producción derivado de la categoría (permite filtrar por igualdad)
+    categoria_grupo TEXT GENERATED ALWAYS AS (
+        CASE WHEN categoria LIKE '%Alimento%' THEN 'alimento'
+             WHEN categoria LIKE '%trabajador%' THEN 'trabajador'
+             ELSE 'otro' END
+    ) VIRTUAL
 );
 
 -- ============================================
 -- ÍNDICES PARA OPTIMIZAR CONSULTAS
 -- ============================================
 
-CREATE INDEX idx_produccion_fecha ON produccion_diaria(fecha);
-CREATE INDEX idx_pedidos_cliente ON pedidos(cliente_id);
-CREATE INDEX idx_pedidos_estado ON pedidos(estado);
-CREATE INDEX idx_pedidos_fecha ON pedidos(fecha);
-CREATE INDEX idx_despachos_pedido ON despachos(pedido_id);
-CREATE INDEX idx_movimientos_fecha ON movimientos_financieros(fecha);
-CREATE INDEX idx_movimientos_tipo ON movimientos_financieros(tipo);
-CREATE INDEX idx_precios_activo ON precios_huevos(activo);
-CREATE INDEX idx_poblacion_fecha ON poblacion_gallinas(fecha);
-CREATE INDEX idx_consumo_fecha ON consumo_alimento(fecha);
+-- Índices compuestos: el filtro por fecha (BETWEEN) y el ORDER BY se
+-- resuelven con un recorrido del índice, sin ordenar en un B-tree temporal.
+-- Reemplazan a los índices de una sola columna que eran su prefijo.
+DROP INDEX IF EXISTS idx_produccion_fecha;
+DROP INDEX IF EXISTS idx_pedidos_estado;
+DROP INDEX IF EXISTS idx_movimientos_fecha;
+CREATE INDEX IF NOT EXISTS idx_produccion_fecha_hora ON produccion_diaria(fecha DESC, hora DESC);
+CREATE INDEX IF NOT EXISTS idx_pedidos_cliente ON pedidos(cliente_id);
+CREATE INDEX IF NOT EXISTS idx_pedidos_estado_fecha ON pedidos(estado, fecha);
+CREATE INDEX IF NOT EXISTS idx_pedidos_estado_total ON pedidos(estado, total_canastillas);
+-- Índices parciales: solo contienen las filas que buscan las pantallas
+-- (pedidos pendientes, insumos bajo el mínimo), así se mantienen pequeños
+-- aunque las tablas crezcan. SQLite los mantiene solo, sin triggers.
+CREATE INDEX IF NOT EXISTS idx_pedidos_pendientes ON pedidos(fecha, hora) WHERE estado = 'pendiente';
+CREATE INDEX IF NOT EXISTS idx_stock_insumos_alerta ON stock_insumos(insumo_id) WHERE cantidad_actual <= stock_minimo;
+CREATE INDEX IF NOT EXISTS idx_pedidos_fecha ON pedidos(fecha);
+CREATE INDEX IF NOT EXISTS idx_despachos_pedido ON despachos(pedido_id);
+-- Cubre los balances por período (tipo/categoría/monto sin leer la tabla)
+CREATE INDEX IF NOT EXISTS idx_movimientos_fecha_tipo ON movimientos_financieros(fecha, tipo, categoria, monto);
+CREATE INDEX IF NOT EXISTS idx_movimientos_tipo ON movimientos_financieros(tipo);
+-- Egresos que entran en el costo de producción (calcular_costo_produccion_por_huevo)
+CREATE INDEX IF NOT EXISTS idx_movimientos_costo ON movimientos_financieros(fecha, monto)
+WHERE tipo = 'egreso' AND categoria_grupo IN ('alimento', 'trabajador');
+CREATE INDEX IF NOT EXISTS idx_precios_activo ON precios_huevos(activo);
+-- Último registro (ORDER BY fecha DESC, hora DESC LIMIT 1) e historiales
+-- por rango sin paso de ordenamiento
+DROP INDEX IF EXISTS idx_poblacion_fecha;
+DROP INDEX IF EXISTS idx_consumo_fecha;
+CREATE INDEX IF NOT EXISTS idx_poblacion_fecha_hora ON poblacion_gallinas(fecha DESC, hora DESC);
+CREATE INDEX IF NOT EXISTS idx_consumo_fecha_hora ON consumo_alimento(fecha DESC, hora DESC);
+CREATE INDEX IF NOT EXISTS idx_insumos_fecha_compra ON insumos(fecha_compra);
+CREATE INDEX IF NOT EXISTS idx_pagos_trabajador_fecha ON pagos_trabajadores(trabajador_id, fecha);
 -- ============================================
 -- TRIGGERS AUTOMÁTICOS
 -- ============================================
@@ -337,6 +368,226 @@ CREATE INDEX IF NOT EXISTS idx_ajustes_fecha ON ajustes_stock_huevos(fecha);
 CREATE INDEX IF NOT EXISTS idx_movimientos_insumos_fecha ON movimientos_insumos(fecha);
 
 
+-- ============================================
+-- TOTALES DIARIOS (mantenidos por triggers)
+-- ============================================
+-- Los reportes por período leen una fila por día en lugar de recorrer
+-- produccion_diaria y pedidos. Los triggers aplican cada cambio como
+-- diferencia (restan OLD y suman NEW).
+
+CREATE TABLE IF NOT EXISTS totales_produccion_diaria (
+    fecha DATE PRIMARY KEY,
+    tipo_c INTEGER NOT NULL DEFAULT 0,
+    tipo_b INTEGER NOT NULL DEFAULT 0,
+    tipo_a INTEGER NOT NULL DEFAULT 0,
+    tipo_aa INTEGER NOT NULL DEFAULT 0,
+    tipo_aaa INTEGER NOT NULL DEFAULT 0,
+    tipo_jumbo INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    registros INTEGER NOT NULL DEFAULT 0
+);
+
+-- Solo pedidos completados (ventas)
+CREATE TABLE IF NOT EXISTS totales_ventas_diarias (
+    fecha DATE PRIMARY KEY,
+    cantidad_ventas INTEGER NOT NULL DEFAULT 0,
+    total_canastillas INTEGER NOT NULL DEFAULT 0,
+    total_ingresos REAL NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS totales_produccion_after_insert
+AFTER INSERT ON produccion_diaria
+BEGIN
+    INSERT INTO totales_produccion_diaria
+        (fecha, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, total, registros)
+    VALUES (NEW.fecha, NEW.tipo_c, NEW.tipo_b, NEW.tipo_a, NEW.tipo_aa, NEW.tipo_aaa,
+            NEW.tipo_jumbo, NEW.total_huevos, 1)
+    ON CONFLICT(fecha) DO UPDATE SET
+        tipo_c = tipo_c + excluded.tipo_c,
+        tipo_b = tipo_b + excluded.tipo_b,
+        tipo_a = tipo_a + excluded.tipo_a,
+        tipo_aa = tipo_aa + excluded.tipo_aa,
+        tipo_aaa = tipo_aaa + excluded.tipo_aaa,
+        tipo_jumbo = tipo_jumbo + excluded.tipo_jumbo,
+        total = total + excluded.total,
+        registros = registros + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS totales_produccion_after_delete
+AFTER DELETE ON produccion_diaria
+BEGIN
+    UPDATE totales_produccion_diaria
+    SET 
+        tipo_c = tipo_c - OLD.tipo_c,
+        tipo_b = tipo_b - OLD.tipo_b,
+        tipo_a = tipo_a - OLD.tipo_a,
+        tipo_aa = tipo_aa - OLD.tipo_aa,
+        tipo_aaa = tipo_aaa - OLD.tipo_aaa,
+        tipo_jumbo = tipo_jumbo - OLD.tipo_jumbo,
+        total = total - OLD.total_huevos,
+        registros = registros - 1
+    WHERE fecha = OLD.fecha;
+    
+    DELETE FROM totales_produccion_diaria WHERE fecha = OLD.fecha AND registros = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS totales_produccion_after_update
+AFTER UPDATE ON produccion_diaria
+BEGIN
+    UPDATE totales_produccion_diaria
+    SET 
+        tipo_c = tipo_c - OLD.tipo_c,
+        tipo_b = tipo_b - OLD.tipo_b,
+        tipo_a = tipo_a - OLD.tipo_a,
+        tipo_aa = tipo_aa - OLD.tipo_aa,
+        tipo_aaa = tipo_aaa - OLD.tipo_aaa,
+        tipo_jumbo = tipo_jumbo - OLD.tipo_jumbo,
+        total = total - OLD.total_huevos,
+        registros = registros - 1
+    WHERE fecha = OLD.fecha;
+    
+    DELETE FROM totales_produccion_diaria WHERE fecha = OLD.fecha AND registros = 0;
+    
+    INSERT INTO totales_produccion_diaria
+        (fecha, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, total, registros)
+    VALUES (NEW.fecha, NEW.tipo_c, NEW.tipo_b, NEW.tipo_a, NEW.tipo_aa, NEW.tipo_aaa,
+            NEW.tipo_jumbo, NEW.total_huevos, 1)
+    ON CONFLICT(fecha) DO UPDATE SET
+        tipo_c = tipo_c + excluded.tipo_c,
+        tipo_b = tipo_b + excluded.tipo_b,
+        tipo_a = tipo_a + excluded.tipo_a,
+        tipo_aa = tipo_aa + excluded.tipo_aa,
+        tipo_aaa = tipo_aaa + excluded.tipo_aaa,
+        tipo_jumbo = tipo_jumbo + excluded.tipo_jumbo,
+        total = total + excluded.total,
+        registros = registros + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS totales_ventas_after_insert
+AFTER INSERT ON pedidos
+WHEN NEW.estado = 'completado'
+BEGIN
+    INSERT INTO totales_ventas_diarias (fecha, cantidad_ventas, total_canastillas, total_ingresos)
+    VALUES (NEW.fecha, 1, NEW.total_canastillas, NEW.precio_total)
+    ON CONFLICT(fecha) DO UPDATE SET
+        cantidad_ventas = cantidad_ventas + 1,
+        total_canastillas = total_canastillas + excluded.total_canastillas,
+        total_ingresos = total_ingresos + excluded.total_ingresos;
+END;
+
+CREATE TRIGGER IF NOT EXISTS totales_ventas_after_delete
+AFTER DELETE ON pedidos
+WHEN OLD.estado = 'completado'
+BEGIN
+    UPDATE totales_ventas_diarias
+    SET 
+        cantidad_ventas = cantidad_ventas - 1,
+        total_canastillas = total_canastillas - OLD.total_canastillas,
+        total_ingresos = total_ingresos - OLD.precio_total
+    WHERE fecha = OLD.fecha;
+    
+    DELETE FROM totales_ventas_diarias WHERE fecha = OLD.fecha AND cantidad_ventas = 0;
+END;
+
+-- Cubre el paso a 'completado' que hace update_stock_after_despacho
+CREATE TRIGGER IF NOT EXISTS totales_ventas_after_update
+AFTER UPDATE ON pedidos
+WHEN OLD.estado = 'completado' OR NEW.estado = 'completado'
+BEGIN
+    UPDATE totales_ventas_diarias
+    SET 
+        cantidad_ventas = cantidad_ventas - 1,
+        total_canastillas = total_canastillas - OLD.total_canastillas,
+        total_ingresos = total_ingresos - OLD.precio_total
+    WHERE fecha = OLD.fecha AND OLD.estado = 'completado';
+    
+    DELETE FROM totales_ventas_diarias WHERE fecha = OLD.fecha AND cantidad_ventas = 0;
+    
+    INSERT INTO totales_ventas_diarias (fecha, cantidad_ventas, total_canastillas, total_ingresos)
+    SELECT NEW.fecha, 1, NEW.total_canastillas, NEW.precio_total
+    WHERE NEW.estado = 'completado'
+    ON CONFLICT(fecha) DO UPDATE SET
+        cantidad_ventas = cantidad_ventas + 1,
+        total_canastillas = total_canastillas + excluded.total_canastillas,
+        total_ingresos = total_ingresos + excluded.total_ingresos;
+END;
+
+-- Pagos por trabajador y mes ('YYYY-MM'): obtener_total_pagos_trabajador
+-- suma los meses completos aquí y solo lee pagos_trabajadores en los bordes
+CREATE TABLE IF NOT EXISTS totales_pagos_trabajador_mes (
+    trabajador_id INTEGER NOT NULL,
+    mes TEXT NOT NULL,
+    total REAL NOT NULL DEFAULT 0,
+    pagos INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (trabajador_id, mes)
+);
+
+CREATE TRIGGER IF NOT EXISTS totales_pagos_after_insert
+AFTER INSERT ON pagos_trabajadores
+BEGIN
+    INSERT INTO totales_pagos_trabajador_mes (trabajador_id, mes, total, pagos)
+    VALUES (NEW.trabajador_id, strftime('%Y-%m', NEW.fecha), NEW.monto, 1)
+    ON CONFLICT(trabajador_id, mes) DO UPDATE SET
+        total = total + excluded.total,
+        pagos = pagos + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS totales_pagos_after_delete
+AFTER DELETE ON pagos_trabajadores
+BEGIN
+    UPDATE totales_pagos_trabajador_mes
+    SET 
+        total = total - OLD.monto,
+        pagos = pagos - 1
+    WHERE trabajador_id = OLD.trabajador_id AND mes = strftime('%Y-%m', OLD.fecha);
+    
+    DELETE FROM totales_pagos_trabajador_mes
+    WHERE trabajador_id = OLD.trabajador_id AND mes = strftime('%Y-%m', OLD.fecha) AND pagos = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS totales_pagos_after_update
+AFTER UPDATE ON pagos_trabajadores
+BEGIN
+    UPDATE totales_pagos_trabajador_mes
+    SET 
+        total = total - OLD.monto,
+        pagos = pagos - 1
+    WHERE trabajador_id = OLD.trabajador_id AND mes = strftime('%Y-%m', OLD.fecha);
+    
+    DELETE FROM totales_pagos_trabajador_mes
+    WHERE trabajador_id = OLD.trabajador_id AND mes = strftime('%Y-%m', OLD.fecha) AND pagos = 0;
+    
+    INSERT INTO totales_pagos_trabajador_mes (trabajador_id, mes, total, pagos)
+    VALUES (NEW.trabajador_id, strftime('%Y-%m', NEW.fecha), NEW.monto, 1)
+    ON CONFLICT(trabajador_id, mes) DO UPDATE SET
+        total = total + excluded.total,
+        pagos = pagos + 1;
+END;
+
+-- Recalcular desde cero: cubre bases creadas antes de estas tablas y
+-- mantiene el schema re-ejecutable
+DELETE FROM totales_produccion_diaria;
+INSERT INTO totales_produccion_diaria
+    (fecha, tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo, total, registros)
+SELECT fecha, SUM(tipo_c), SUM(tipo_b), SUM(tipo_a), SUM(tipo_aa), SUM(tipo_aaa),
+       SUM(tipo_jumbo), SUM(total_huevos), COUNT(*)
+FROM produccion_diaria
+GROUP BY fecha;
+
+DELETE FROM totales_ventas_diarias;
+INSERT INTO totales_ventas_diarias (fecha, cantidad_ventas, total_canastillas, total_ingresos)
+SELECT fecha, COUNT(*), SUM(total_canastillas), SUM(precio_total)
+FROM pedidos
+WHERE estado = 'completado'
+GROUP BY fecha;
+
+DELETE FROM totales_pagos_trabajador_mes;
+INSERT INTO totales_pagos_trabajador_mes (trabajador_id, mes, total, pagos)
+SELECT trabajador_id, strftime('%Y-%m', fecha), SUM(monto), COUNT(*)
+FROM pagos_trabajadores
+GROUP BY trabajador_id, strftime('%Y-%m', fecha);
+
+
 -- ============================================
 -- DATOS INICIALES
 -- ============================================
@@ -346,5 +597,10 @@ INSERT OR IGNORE INTO stock_huevos (id, fecha, hora, tipo_c, tipo_b, tipo_a, tip
 VALUES (1, date('now'), time('now'), 0, 0, 0, 0, 0, 0);
 
 -- Precio inicial (ajustar según necesidad)
-INSERT OR IGNORE INTO precios_huevos (fecha_vigencia, precio_c, precio_b, precio_a, precio_aa, precio_aaa, precio_jumbo, activo)
-VALUES (date('now'), 300, 350, 400, 450, 500, 550, 1);
\ No newline at end of file
+-- Solo si la tabla está vacía, para que el schema pueda re-ejecutarse sin perder precios
+INSERT INTO precios_huevos (fecha_vigencia, precio_c, precio_b, precio_a, precio_aa, precio_aaa, precio_jumbo, activo)
+SELECT date('now'), 300, 350, 400, 450, 500, 550, 1
+WHERE NOT EXISTS (SELECT 1 FROM precios_huevos);
+
+-- Estadísticas para que el planificador elija los índices compuestos
+ANALYZE;
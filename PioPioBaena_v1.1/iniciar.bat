@@ -46,8 +46,8 @@ echo.
 echo ========================================
 echo.
 
-REM Ejecutar Streamlit
-python -m streamlit run app.py
+REM Ejecutar Streamlit (sin vigilar cambios en los archivos: uso diario, no desarrollo)
+python -m streamlit run app.py --server.fileWatcherType none
 
 REM Si Streamlit se cierra, mostrar mensaje
 echo.
@@ -0,0 +1,44 @@
+"""
+Estructura común de la aplicación: configuración de página,
+encabezado con logo y selector de estilo visual.
+"""
+
+import streamlit as st
+from modules import utils as util
+
+# Pestañas principales de la aplicación
+TAB_LABELS = [
+    "📊 Producción",
+    "📦 Stock",
+    "🚚 Ventas",
+    "💰 Insumos y Pagos",
+    "📈 Reportes"
+]
+
+# Estilos visuales disponibles en la barra lateral
+ESTILOS = {
+    "Original (Verde)": util.set_custom_style_2,
+    "Cosecha (Cálido)": util.set_harvest_style,
+    "Tecno (Limpio)": util.set_techno_agro_style,
+}
+
+
+def render_shell():
+    """
+    Dibuja la estructura fija de la página y retorna las pestañas principales.
+    
+    Returns:
+        list: Contenedores de st.tabs en el orden de TAB_LABELS
+    """
+    # Cargar el logo (ruta relativa al directorio desde donde ejecutas streamlit)
+    st.set_page_config(page_title="Pio Pio Baena", page_icon="images/Logo.png", layout="wide")
+    col_title, col_logo = st.columns([6,2])
+    with col_title:
+        st.title("Pio Pio Baena - Gestión Avícola")
+    with col_logo:
+        util.show_logo(width=90)
+    
+    estilo = st.sidebar.radio("Seleccionar Estilo Visual", list(ESTILOS))
+    ESTILOS[estilo]()
+    
+    return st.tabs(TAB_LABELS)
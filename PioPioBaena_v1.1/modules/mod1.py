@@ -6,16 +6,132 @@ Gestiona el registro y visualización de la producción de huevos
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
 from typing import Dict
 from modules import utils as util
 
 # Importar la base de datos y repositorios
 import sys
 sys.path.append('..')
-from data.database import db
-from data.models import ProduccionRepository, StockRepository, GallinasRepository
+from data.database import get_db
+from data.models import ProduccionRepository, StockRepository, GallinasRepository, CATEGORIAS_STOCK
+
+# Database memoriza las lecturas entre reruns; las escrituras invalidan el caché
+db = get_db()
+
+# Columna de la base -> etiqueta de la categoría
+ETIQUETAS_CATEGORIAS = dict(zip(CATEGORIAS_STOCK, ('C', 'B', 'A', 'AA', 'AAA', 'Jumbo')))
+
+
+# Opciones de registros por página en el historial
+TAMANOS_PAGINA = [50, 100, 250, 500]
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cargar_produccion(fecha_inicio, fecha_fin, data_version, limite=-1, offset=0):
+    """
+    DataFrame de los registros de producción del período (o de una página),
+    memorizado entre reruns. data_version forma parte de la clave: una
+    escritura lo invalida.
+    """
+    registros = ProduccionRepository(db).obtener_produccion_por_fecha(
+        fecha_inicio, fecha_fin, limite, offset
+    )
+    if not registros:
+        return pd.DataFrame()
+    return pd.DataFrame(registros, columns=registros[0].keys())
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cargar_resumen_diario(fecha_inicio, fecha_fin, data_version):
+    """DataFrame del resumen diario de producción (fecha ya convertida a datetime)"""
+    registros = ProduccionRepository(db).obtener_resumen_diario(fecha_inicio, fecha_fin)
+    if not registros:
+        return pd.DataFrame()
+    df = pd.DataFrame(registros, columns=registros[0].keys())
+    df['fecha'] = pd.to_datetime(df['fecha'], format='%Y-%m-%d')
+    return df
+
+
+@st.cache_data(ttl=120, max_entries=20, show_spinner=False)
+def _figuras_analisis(fecha_inicio, fecha_fin, data_version):
+    """
+    Figuras de la pestaña Análisis (línea diaria, área por categoría y torta),
+    memorizadas por período y versión de datos: un rerun con los mismos
+    filtros no vuelve a construirlas.
+    
+    Returns:
+        tuple: (fig_total, fig_categorias, fig_pie); fig_pie es None si el
+        período no tiene producción
+    """
+    # Plotly solo se importa al graficar: registrar e historial no lo necesitan
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    df = _cargar_resumen_diario(fecha_inicio, fecha_fin, data_version)
+    
+    fig_total = px.line(
+        df, 
+        x='fecha', 
+        y='total',
+        title='Producción Total por Día',
+        labels={'fecha': 'Fecha', 'total': 'Cantidad de huevos'},
+        markers=True
+    )
+    fig_total.update_layout(hovermode='x unified')
+    
+    # Renombrar las 6 columnas antes del melt (no mapear cada fila después)
+    df_categorias = df[['fecha', *CATEGORIAS_STOCK]].rename(
+        columns=ETIQUETAS_CATEGORIAS
+    ).melt(
+        id_vars=['fecha'], 
+        var_name='Categoría', 
+        value_name='Cantidad'
+    )
+    fig_categorias = px.area(
+        df_categorias,
+        x='fecha',
+        y='Cantidad',
+        color='Categoría',
+        title='Distribución de Producción por Categoría',
+        labels={'fecha': 'Fecha', 'Cantidad': 'Cantidad de huevos'}
+    )
+    
+    # Totales del período a partir del resumen diario, sin categorías vacías
+    categorias_data = df[list(CATEGORIAS_STOCK)].sum().rename(ETIQUETAS_CATEGORIAS).to_dict()
+    categorias_data = {k: v for k, v in categorias_data.items() if v > 0}
+    
+    fig_pie = None
+    if categorias_data:
+        fig_pie = go.Figure(data=[go.Pie(
+            labels=list(categorias_data.keys()),
+            values=list(categorias_data.values()),
+            hole=0.3
+        )])
+        fig_pie.update_layout(title='Distribución por Categoría (%)')
+    
+    return fig_total, fig_categorias, fig_pie
+
+
+def _tabla_historial(df):
+    """Columnas y encabezados de la tabla de historial (y de su CSV)"""
+    df_display = df[[
+        'fecha', 'hora', 'tipo_c', 'tipo_b', 'tipo_a', 
+        'tipo_aa', 'tipo_aaa', 'tipo_jumbo', 'total', 'observaciones'
+    ]].copy()
+    df_display.columns = [
+        'Fecha', 'Hora', 'C', 'B', 'A', 'AA', 'AAA', 'Jumbo', 'Total', 'Observaciones'
+    ]
+    return df_display
+
+
+@st.cache_data(ttl=300, max_entries=20, show_spinner=False)
+def _generar_csv_produccion(fecha_inicio, fecha_fin, data_version):
+    """
+    Bytes del CSV del historial: se serializa una sola vez por período
+    (y versión de datos), no en cada clic de exportar.
+    """
+    df = _cargar_produccion(fecha_inicio, fecha_fin, data_version)
+    return _tabla_historial(df).to_csv(index=False).encode('utf-8')
 
 
 class ProduccionModule:
@@ -25,13 +141,22 @@ class ProduccionModule:
         self.produccion_repo = ProduccionRepository(db)
         self.stock_repo = StockRepository(db)
         self.gallinas_repo = GallinasRepository(db)
-        self.categorias = ['C', 'B', 'A', 'AA', 'AAA', 'Jumbo']
+        self.categorias = list(ETIQUETAS_CATEGORIAS.values())
     
     def render(self):
         """Renderiza la interfaz completa del módulo"""
         #util.set_custom_style()
         st.header("📊 Gestión de Producción Diaria")
         
+        # Valores por defecto de fecha/hora fijos durante la sesión: si cambian
+        # en cada rerun, Streamlit trata los widgets como nuevos y los reinicia.
+        # Se renuevan al cambiar el día o tras guardar una producción.
+        if st.session_state.get('produccion_hoy') != date.today():
+            st.session_state.produccion_hoy = date.today()
+            st.session_state.pop('produccion_hora', None)
+        self.hoy = st.session_state.produccion_hoy
+        self.hora_actual = st.session_state.setdefault('produccion_hora', datetime.now().time())
+        
         # Crear sub-tabs dentro de producción
         tabs = st.tabs(["➕ Registrar Producción", "📋 Historial", "📊 Análisis"])
         
@@ -55,14 +180,14 @@ class ProduccionModule:
             with col_fecha:
                 fecha = st.date_input(
                     "Fecha de recolección",
-                    value=date.today(),
-                    max_value=date.today()
+                    value=self.hoy,
+                    max_value=self.hoy
                 )
             
             with col_hora:
                 hora = st.time_input(
                     "Hora de recolección",
-                    value=datetime.now().time()
+                    value=self.hora_actual
                 )
             
             st.markdown("---")
@@ -84,9 +209,9 @@ class ProduccionModule:
             with col_jumbo:
                 tipo_jumbo = st.number_input("🥚 Jumbo", min_value=0, step=1, value=0)
             
-            # Calcular total
-            total_huevos = tipo_c + tipo_b + tipo_a + tipo_aa + tipo_aaa + tipo_jumbo
-            st.info(f"📦 **Total de huevos a registrar:** {total_huevos}")
+            # Dentro de un st.form los valores solo llegan al enviar: el total se
+            # valida y se informa al procesar el envío, no en un aviso en vivo
+            total_huevos = sum((tipo_c, tipo_b, tipo_a, tipo_aa, tipo_aaa, tipo_jumbo))
             
             # Observaciones
             observaciones = st.text_area(
@@ -99,9 +224,6 @@ class ProduccionModule:
             col_btn1, col_btn2 = st.columns([1, 4])
             with col_btn1:
                 submitted = st.form_submit_button("💾 Guardar Producción", use_container_width=True)
-            with col_btn2:
-                if total_huevos == 0:
-                    st.warning("⚠️ Debes ingresar al menos un huevo para registrar")
         
         # Procesar el formulario de producción
         if submitted:
@@ -110,7 +232,7 @@ class ProduccionModule:
                     # Registrar en la base de datos
                     produccion_id = self.produccion_repo.registrar_produccion(
                         fecha=fecha,
-                        hora=hora.strftime("%H:%M:%S"),  # Convertir a string
+                        hora=hora,
                         tipo_c=tipo_c,
                         tipo_b=tipo_b,
                         tipo_a=tipo_a,
@@ -120,18 +242,26 @@ class ProduccionModule:
                         observaciones=observaciones if observaciones else None
                     )
                     
-                    st.success(f"✅ Producción registrada exitosamente (ID: {produccion_id})")
-                    st.success(f"📦 Total: {total_huevos} huevos agregados al stock")
+                    # El próximo registro propone la hora actual
+                    st.session_state.pop('produccion_hora', None)
                     
-                    # Mostrar stock actualizado
-                    stock_actual = self.stock_repo.obtener_stock_actual()
-                    self._mostrar_stock_resumido(stock_actual)
+                    # Rerun completo para que las demás pestañas reflejen el nuevo stock
+                    st.session_state.mensajes_produccion = [
+                        ("success", f"✅ Producción registrada exitosamente (ID: {produccion_id})"),
+                        ("success", f"📦 Total: {total_huevos} huevos agregados al stock")
+                    ]
+                    st.rerun()
                     
                 except Exception as e:
                     st.error(f"❌ Error al registrar la producción: {str(e)}")
             else:
                 st.error("⚠️ Debes ingresar al menos un huevo para registrar")
         
+        if self._mostrar_mensajes("mensajes_produccion"):
+            # Mostrar stock actualizado
+            stock_actual = self.stock_repo.obtener_stock_actual()
+            self._mostrar_stock_resumido(stock_actual)
+        
         # ==================== FORMULARIOS ADICIONALES ====================
     
         # ==================== REGISTROS ADICIONALES ====================
@@ -140,14 +270,14 @@ class ProduccionModule:
         st.markdown("---")
         col_chickens, col_food = st.columns(2)
         
+        # Población actual: una sola lectura por rerun, compartida por ambas secciones
+        poblacion_actual = self.gallinas_repo.obtener_poblacion_actual()
+        cantidad_actual = poblacion_actual.get('cantidad_gallinas', 0)
+        
         # SECCIÓN 1: POBLACIÓN DE GALLINAS (sin formulario)
         with col_chickens:
             st.subheader("🐔 Población de Gallinas")
             
-            # Obtener población actual
-            poblacion_actual = self.gallinas_repo.obtener_poblacion_actual()
-            cantidad_actual = poblacion_actual.get('cantidad_gallinas', 0)
-            
             st.info(f"**Población actual:** {cantidad_actual} gallinas")
             
             cantidad_gallinas = st.number_input(
@@ -178,24 +308,26 @@ class ProduccionModule:
                 try:
                     gallinas_id = self.gallinas_repo.registrar_poblacion(
                         fecha=date.today(),
-                        hora=datetime.now().strftime("%H:%M:%S"),
+                        hora=datetime.now().time(),
                         cantidad_gallinas=cantidad_gallinas,
                         descartes=descartes,
                         observaciones=obs_gallinas if obs_gallinas else None
                     )
-                    st.success(f"✅ Población registrada: {cantidad_gallinas} gallinas")
+                    mensajes = [("success", f"✅ Población registrada: {cantidad_gallinas} gallinas")]
                     if descartes > 0:
-                        st.info(f"📉 Descartes registrados: {descartes}")
+                        mensajes.append(("info", f"📉 Descartes registrados: {descartes}"))
+                    st.session_state.mensajes_poblacion = mensajes
+                    st.rerun()
                 except Exception as e:
                     st.error(f"❌ Error: {str(e)}")
+            
+            self._mostrar_mensajes("mensajes_poblacion")
         
         # SECCIÓN 2: CONSUMO DE ALIMENTO (sin formulario)
         with col_food:
             st.subheader("🌾 Consumo de Alimento")
             
-            # Obtener población actual para el cálculo
-            poblacion_actual = self.gallinas_repo.obtener_poblacion_actual()
-            cantidad_gallinas_actual = poblacion_actual.get('cantidad_gallinas', 0)
+            cantidad_gallinas_actual = cantidad_actual
             
             if cantidad_gallinas_actual > 0:
                 st.info(f"**Gallinas activas:** {cantidad_gallinas_actual}")
@@ -226,20 +358,58 @@ class ProduccionModule:
                     try:
                         alimento_id = self.gallinas_repo.registrar_consumo_alimento(
                             fecha=date.today(),
-                            hora=datetime.now().strftime("%H:%M:%S"),
+                            hora=datetime.now().time(),
                             consumo_por_gallina=consumo_por_gallina,
                             cantidad_gallinas=cantidad_gallinas_actual,
                             observaciones=obs_alimento if obs_alimento else None
                         )
                         consumo_total = consumo_por_gallina * cantidad_gallinas_actual
-                        st.success(f"✅ Consumo registrado: {consumo_total/1000:.2f} kg")
+                        st.session_state.mensajes_consumo = [("success", f"✅ Consumo registrado: {consumo_total/1000:.2f} kg")]
+                        st.rerun()
                     except Exception as e:
                         st.error(f"❌ Error: {str(e)}")
                 elif cantidad_gallinas_actual == 0:
                     st.error("⚠️ Primero registra la población de gallinas")
                 else:
                     st.error("⚠️ Ingresa el consumo de alimento")
+            
+            self._mostrar_mensajes("mensajes_consumo")
         
+        # Población y consumo juntos: ambos registros en una sola transacción
+        if st.button("💾 Guardar Todo (población y consumo)", use_container_width=True, key="btn_guardar_todo"):
+            if cantidad_gallinas > 0 and consumo_por_gallina > 0:
+                try:
+                    self.gallinas_repo.registrar_poblacion_y_consumo(
+                        fecha=date.today(),
+                        hora=datetime.now().time(),
+                        cantidad_gallinas=cantidad_gallinas,
+                        descartes=descartes,
+                        consumo_por_gallina=consumo_por_gallina,
+                        observaciones_poblacion=obs_gallinas if obs_gallinas else None,
+                        observaciones_consumo=obs_alimento if obs_alimento else None
+                    )
+                    consumo_total = consumo_por_gallina * cantidad_gallinas
+                    st.session_state.mensajes_guardar_todo = [
+                        ("success", f"✅ Población registrada: {cantidad_gallinas} gallinas"),
+                        ("success", f"✅ Consumo registrado: {consumo_total/1000:.2f} kg")
+                    ]
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"❌ Error: {str(e)}")
+            else:
+                st.error("⚠️ Ingresa la población de gallinas y el consumo de alimento")
+        
+        self._mostrar_mensajes("mensajes_guardar_todo")
+        
+    def _mostrar_mensajes(self, clave: str) -> bool:
+        """Muestra (una sola vez) los mensajes guardados antes del último st.rerun()"""
+        mensajes = st.session_state.pop(clave, None)
+        if not mensajes:
+            return False
+        for tipo, mensaje in mensajes:
+            getattr(st, tipo)(mensaje)
+        return True
+    
     def _render_historial(self):
         """Muestra el historial de producción"""
         st.subheader("📋 Historial de Producción")
@@ -250,13 +420,13 @@ class ProduccionModule:
         with col1:
             fecha_inicio = st.date_input(
                 "Fecha inicio",
-                value=date.today() - timedelta(days=30)
+                value=self.hoy - timedelta(days=30)
             )
         
         with col2:
             fecha_fin = st.date_input(
                 "Fecha fin",
-                value=date.today()
+                value=self.hoy
             )
         
         with col3:
@@ -265,52 +435,54 @@ class ProduccionModule:
         
         # Obtener datos
         try:
-            registros = self.produccion_repo.obtener_produccion_por_fecha(
-                fecha_inicio, fecha_fin
-            )
+            # Métricas de todo el período en una agregación SQL; la tabla, por páginas
+            stats = self.produccion_repo.obtener_estadisticas_periodo(fecha_inicio, fecha_fin)
             
-            if registros:
-                # Convertir a DataFrame
-                df = pd.DataFrame(registros)
+            if stats['registros']:
                 
-                # Calcular total por registro
-                df['total'] = (
-                    df['tipo_c'] + df['tipo_b'] + df['tipo_a'] + 
-                    df['tipo_aa'] + df['tipo_aaa'] + df['tipo_jumbo']
-                )
-                
-                # Mostrar métricas
                 col_m1, col_m2, col_m3, col_m4 = st.columns(4)
                 
                 with col_m1:
-                    st.metric("📅 Días registrados", len(df))
+                    st.metric("📅 Días registrados", stats['registros'])
                 
                 with col_m2:
-                    st.metric("🥚 Total producido", f"{df['total'].sum():,}")
+                    st.metric("🥚 Total producido", f"{stats['total']:,}")
                 
                 with col_m3:
-                    promedio = df['total'].mean()
-                    st.metric("📊 Promedio diario", f"{promedio:.0f}")
+                    st.metric("📊 Promedio diario", f"{stats['promedio']:.0f}")
                 
                 with col_m4:
-                    mejor_dia = df.loc[df['total'].idxmax()]
-                    st.metric("🏆 Mejor día", f"{mejor_dia['total']}")
+                    st.metric("🏆 Mejor día", f"{stats['maximo']}")
                 
                 st.markdown("---")
                 
                 # Tabla de registros
                 st.markdown("**Registros detallados:**")
                 
-                # Preparar datos para mostrar
-                df_display = df[[
-                    'fecha', 'hora', 'tipo_c', 'tipo_b', 'tipo_a', 
-                    'tipo_aa', 'tipo_aaa', 'tipo_jumbo', 'total', 'observaciones'
-                ]].copy()
+                col_tamano, col_pagina = st.columns([1, 1])
+                with col_tamano:
+                    tamano_pagina = st.selectbox(
+                        "Registros por página", TAMANOS_PAGINA, key="historial_tamano_pagina"
+                    )
+                total_paginas = -(-stats['registros'] // tamano_pagina)
+                # Al acortar el período la página elegida puede dejar de existir
+                if st.session_state.get("historial_pagina", 1) > total_paginas:
+                    st.session_state.historial_pagina = total_paginas
+                with col_pagina:
+                    pagina = st.number_input(
+                        f"Página (de {total_paginas})",
+                        min_value=1, max_value=total_paginas, step=1,
+                        key="historial_pagina"
+                    )
+                
+                # 'total' por registro viene de la columna generada total_huevos
+                df = _cargar_produccion(
+                    fecha_inicio, fecha_fin, db.data_version,
+                    tamano_pagina, (pagina - 1) * tamano_pagina
+                )
                 
-                # Renombrar columnas para mejor visualización
-                df_display.columns = [
-                    'Fecha', 'Hora', 'C', 'B', 'A', 'AA', 'AAA', 'Jumbo', 'Total', 'Observaciones'
-                ]
+                # Preparar datos para mostrar (columnas renombradas)
+                df_display = _tabla_historial(df)
                 
                 # Mostrar con opciones de formato
                 st.dataframe(
@@ -326,10 +498,9 @@ class ProduccionModule:
                 
                 # Opción de exportar
                 if st.button("📥 Exportar a CSV"):
-                    csv = df_display.to_csv(index=False).encode('utf-8')
                     st.download_button(
                         label="⬇️ Descargar CSV",
-                        data=csv,
+                        data=_generar_csv_produccion(fecha_inicio, fecha_fin, db.data_version),
                         file_name=f"produccion_{fecha_inicio}_a_{fecha_fin}.csv",
                         mime="text/csv"
                     )
@@ -350,122 +521,57 @@ class ProduccionModule:
         with col1:
             fecha_inicio = st.date_input(
                 "Desde",
-                value=date.today() - timedelta(days=30),
+                value=self.hoy - timedelta(days=30),
                 key="analisis_inicio"
             )
         
         with col2:
             fecha_fin = st.date_input(
                 "Hasta",
-                value=date.today(),
+                value=self.hoy,
                 key="analisis_fin"
             )
         
         try:
-            # Obtener datos
-            registros = self.produccion_repo.obtener_produccion_por_fecha(
-                fecha_inicio, fecha_fin
-            )
+            # Una fila por día, ya agregada en SQLite (totales por categoría y total)
+            df = _cargar_resumen_diario(fecha_inicio, fecha_fin, db.data_version)
             
-            if registros:
-                df = pd.DataFrame(registros)
-                
-                # Calcular total
-                df['total'] = (
-                    df['tipo_c'] + df['tipo_b'] + df['tipo_a'] + 
-                    df['tipo_aa'] + df['tipo_aaa'] + df['tipo_jumbo']
+            if not df.empty:
+                fig_total, fig_categorias, fig_pie = _figuras_analisis(
+                    fecha_inicio, fecha_fin, db.data_version
                 )
                 
-                # Convertir fecha a datetime
-                df['fecha'] = pd.to_datetime(df['fecha'])
-                
                 # Gráfico 1: Producción total por día
                 st.markdown("**Producción diaria total:**")
-                fig_total = px.line(
-                    df, 
-                    x='fecha', 
-                    y='total',
-                    title='Producción Total por Día',
-                    labels={'fecha': 'Fecha', 'total': 'Cantidad de huevos'},
-                    markers=True
-                )
-                fig_total.update_layout(hovermode='x unified')
                 st.plotly_chart(fig_total, use_container_width=True)
                 
                 # Gráfico 2: Producción por categoría (área apilada)
                 st.markdown("**Producción por categoría:**")
-                df_categorias = df[['fecha', 'tipo_c', 'tipo_b', 'tipo_a', 'tipo_aa', 'tipo_aaa', 'tipo_jumbo']].copy()
-                df_categorias = df_categorias.melt(
-                    id_vars=['fecha'], 
-                    var_name='Categoría', 
-                    value_name='Cantidad'
-                )
-                
-                # Renombrar categorías
-                categoria_map = {
-                    'tipo_c': 'C',
-                    'tipo_b': 'B',
-                    'tipo_a': 'A',
-                    'tipo_aa': 'AA',
-                    'tipo_aaa': 'AAA',
-                    'tipo_jumbo': 'Jumbo'
-                }
-                df_categorias['Categoría'] = df_categorias['Categoría'].map(categoria_map)
-                
-                fig_categorias = px.area(
-                    df_categorias,
-                    x='fecha',
-                    y='Cantidad',
-                    color='Categoría',
-                    title='Distribución de Producción por Categoría',
-                    labels={'fecha': 'Fecha', 'Cantidad': 'Cantidad de huevos'}
-                )
                 st.plotly_chart(fig_categorias, use_container_width=True)
                 
                 # Gráfico 3: Distribución porcentual por categoría
                 st.markdown("**Distribución total del período:**")
-                total_periodo = self.produccion_repo.obtener_total_produccion_periodo(
-                    fecha_inicio, fecha_fin
-                )
-                
-                categorias_data = {
-                    'C': total_periodo.get('total_c', 0) or 0,
-                    'B': total_periodo.get('total_b', 0) or 0,
-                    'A': total_periodo.get('total_a', 0) or 0,
-                    'AA': total_periodo.get('total_aa', 0) or 0,
-                    'AAA': total_periodo.get('total_aaa', 0) or 0,
-                    'Jumbo': total_periodo.get('total_jumbo', 0) or 0
-                }
-                
-                # Filtrar categorías con producción > 0
-                categorias_data = {k: v for k, v in categorias_data.items() if v > 0}
-                
-                if categorias_data:
-                    fig_pie = go.Figure(data=[go.Pie(
-                        labels=list(categorias_data.keys()),
-                        values=list(categorias_data.values()),
-                        hole=0.3
-                    )])
-                    fig_pie.update_layout(title='Distribución por Categoría (%)')
+                if fig_pie is not None:
                     st.plotly_chart(fig_pie, use_container_width=True)
                 
                 # Resumen estadístico
                 st.markdown("---")
                 st.markdown("**📈 Resumen Estadístico:**")
                 
+                stats = df['total'].agg(['sum', 'mean', 'max', 'min', 'std', 'count'])
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric("Producción Total", f"{df['total'].sum():,} huevos")
-                    st.metric("Promedio Diario", f"{df['total'].mean():.0f} huevos")
+                    st.metric("Producción Total", f"{int(stats['sum']):,} huevos")
+                    st.metric("Promedio Diario", f"{stats['mean']:.0f} huevos")
                 
                 with col2:
-                    st.metric("Producción Máxima", f"{df['total'].max()} huevos")
-                    st.metric("Producción Mínima", f"{df['total'].min()} huevos")
+                    st.metric("Producción Máxima", f"{int(stats['max'])} huevos")
+                    st.metric("Producción Mínima", f"{int(stats['min'])} huevos")
                 
                 with col3:
-                    st.metric("Desviación Estándar", f"{df['total'].std():.1f}")
-                    st.metric("Días Registrados", len(df))
+                    st.metric("Desviación Estándar", f"{stats['std']:.1f}")
+                    st.metric("Días Registrados", int(stats['count']))
                 
             else:
                 st.info("ℹ️ No hay datos suficientes para generar análisis")
@@ -478,16 +584,14 @@ class ProduccionModule:
         st.markdown("---")
         st.markdown("**📦 Stock actualizado:**")
         
-        cols = st.columns(6)
-        categorias = ['tipo_c', 'tipo_b', 'tipo_a', 'tipo_aa', 'tipo_aaa', 'tipo_jumbo']
-        nombres = ['C', 'B', 'A', 'AA', 'AAA', 'Jumbo']
+        valores = [f"{stock.get(cat, 0):,}" for cat in ETIQUETAS_CATEGORIAS]
         
-        for col, cat, nombre in zip(cols, categorias, nombres):
-            with col:
-                st.metric(nombre, f"{stock.get(cat, 0):,}")
+        for col, nombre, valor in zip(st.columns(6), ETIQUETAS_CATEGORIAS.values(), valores):
+            col.metric(nombre, valor)
 
 
 # Función principal para llamar desde app.py
+@st.fragment
 def render_produccion():
     """Función principal que se llama desde app.py"""
     module = ProduccionModule()
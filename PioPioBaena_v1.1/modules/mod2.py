@@ -6,24 +6,211 @@ Gestiona el stock de huevos e insumos, ajustes y movimientos
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
-import plotly.express as px
+from operator import itemgetter
 import plotly.graph_objects as go
 from typing import Dict, List
 
 # Importar la base de datos y repositorios
 import sys
 sys.path.append('..')
-from data.database import db
-from data.models import StockRepository, InsumosRepository
+from data.database import get_db
+from data.models import StockRepository, InsumosRepository, CATEGORIAS_STOCK
+
+# Database memoriza las lecturas entre reruns; las escrituras invalidan el caché
+db = get_db()
+
+# Paleta cualitativa por defecto de Plotly; las barras se arman con go.Bar
+# (más barato que px.bar para tan pocas filas) y el color se asigna aquí
+PALETA = ['#636EFA', '#EF553B', '#00CC96', '#AB63FA', '#FFA15A', '#19D3F3',
+          '#FF6692', '#B6E880', '#FF97FF', '#FECB52']
+# Etiquetas de las categorías de huevo, en el orden de CATEGORIAS_STOCK
+CATEGORIAS_HUEVOS = ('C', 'B', 'A', 'AA', 'AAA', 'Jumbo')
+COLORES_HUEVOS = dict(zip(CATEGORIAS_HUEVOS, PALETA))
+
+# Lee las 6 cantidades del stock de huevos en una sola llamada
+_cantidades_stock = itemgetter(*CATEGORIAS_STOCK)
+
+# Filas por tabla de historial: más allá se pagina para no serializar
+# miles de filas hacia el navegador en cada rerun
+MAX_FILAS_TABLA = 1000
+
+# Columna de la base -> encabezado en pantalla. Las tablas se muestran con
+# column_config/column_order sobre el DataFrame original, sin copiarlo para
+# renombrar columnas
+ETIQUETAS_AJUSTES = {
+    'fecha': 'Fecha', 'hora': 'Hora', 'tipo_ajuste': 'Tipo',
+    'tipo_c': 'C', 'tipo_b': 'B', 'tipo_a': 'A', 'tipo_aa': 'AA',
+    'tipo_aaa': 'AAA', 'tipo_jumbo': 'Jumbo', 'total': 'Total', 'motivo': 'Motivo'
+}
+COLUMNAS_SUMA_AJUSTES = [*CATEGORIAS_STOCK, 'total']
+ETIQUETAS_MOVIMIENTOS_INSUMOS = {
+    'fecha': 'Fecha', 'hora': 'Hora', 'insumo_nombre': 'Insumo', 'categoria': 'Categoría',
+    'tipo_movimiento': 'Tipo', 'cantidad': 'Cantidad', 'unidad': 'Unidad', 'motivo': 'Motivo'
+}
+
+
+# Figuras memorizadas por contenido: st.cache_data hashea el DataFrame (pocas
+# filas), así que un rerun con las mismas cantidades no reconstruye el gráfico
+@st.cache_data(max_entries=20, show_spinner=False)
+def _figura_barras_huevos(df_grafico):
+    """Barras de stock de huevos por categoría"""
+    fig = go.Figure(go.Bar(
+        x=df_grafico['Categoría'],
+        y=df_grafico['Cantidad'],
+        text=df_grafico['Cantidad'],
+        textposition='outside',
+        marker_color=[COLORES_HUEVOS[c] for c in df_grafico['Categoría']]
+    ))
+    fig.update_layout(
+        title='Stock por Categoría',
+        xaxis_title='Categoría',
+        yaxis_title='Cantidad'
+    )
+    return fig
+
+
+@st.cache_data(max_entries=20, show_spinner=False)
+def _figura_torta_huevos(df_grafico):
+    """Distribución porcentual del stock de huevos"""
+    # Porcentajes calculados aquí y pasados como texto; sort=False evita que
+    # Plotly reordene las porciones
+    cantidades = df_grafico['Cantidad'].to_numpy()
+    porcentajes = 100 * cantidades / cantidades.sum()
+    fig = go.Figure(data=[go.Pie(
+        labels=df_grafico['Categoría'],
+        values=cantidades,
+        text=[f"{p:.1f}%" for p in porcentajes],
+        textinfo='label+text',
+        hole=0.3,
+        sort=False,
+        marker_colors=[COLORES_HUEVOS[c] for c in df_grafico['Categoría']]
+    )])
+    fig.update_layout(title='Distribución Porcentual')
+    return fig
+
+
+@st.cache_data(max_entries=20, show_spinner=False)
+def _figura_stock_insumos(stock_por_categoria):
+    """Barras de stock total de insumos por categoría"""
+    categorias = stock_por_categoria['Categoría'].astype(str)
+    fig = go.Figure(go.Bar(
+        x=categorias,
+        y=stock_por_categoria['Cantidad Total'],
+        marker_color=[PALETA[i % len(PALETA)] for i in range(len(categorias))]
+    ))
+    fig.update_layout(
+        title='Stock Total por Categoría',
+        xaxis_title='Categoría',
+        yaxis_title='Cantidad Total'
+    )
+    return fig
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cargar_historial_ajustes(fecha_inicio, fecha_fin, data_version):
+    """
+    DataFrame del historial de ajustes de huevos. Lo comparten la pestaña
+    de stock y la de movimientos: con el mismo período no se vuelve a armar.
+    data_version forma parte de la clave: una escritura lo invalida.
+    """
+    # 'total' de cada ajuste viene calculado desde SQL
+    return pd.DataFrame(StockRepository(db).obtener_historial_ajustes_huevos(fecha_inicio, fecha_fin))
+
+
+def _mostrar_tabla(df, etiquetas, column_config=None):
+    """
+    st.dataframe de las columnas de `etiquetas` (en ese orden y con esos
+    encabezados), sin copiar ni renombrar el DataFrame.
+    
+    Args:
+        df: DataFrame con los nombres de columna de la base
+        etiquetas: Dict columna -> encabezado a mostrar
+        column_config: Configuración adicional por columna (formato, etc.)
+    """
+    config = {col: st.column_config.Column(etiqueta) for col, etiqueta in etiquetas.items()}
+    config.update(column_config or {})
+    st.dataframe(
+        df,
+        use_container_width=True,
+        hide_index=True,
+        column_order=[col for col in etiquetas if col in df.columns],
+        column_config=config
+    )
+
+
+def _mostrar_historial(df, etiquetas, claves_resumen, columnas_suma, key):
+    """
+    Muestra una tabla de historial (ordenada de la más reciente a la más
+    antigua) acotando las filas enviadas al navegador.
+    
+    Con "Resumen diario" se muestran las sumas por día en lugar del detalle;
+    si no, los MAX_FILAS_TABLA registros más recientes y, a pedido, los
+    anteriores por páginas del mismo tamaño.
+    
+    Args:
+        df: DataFrame con los nombres de columna de la base (columna 'fecha')
+        etiquetas: Dict columna -> encabezado a mostrar
+        claves_resumen: Columnas por las que se agrupa el resumen diario
+        columnas_suma: Columnas numéricas que se suman en el resumen
+        key: Prefijo de las keys de los widgets
+    """
+    if st.toggle("Resumen diario", key=f"{key}_resumen"):
+        # sort=False conserva el orden por fecha descendente del detalle
+        resumen = df.groupby(claves_resumen, sort=False)[columnas_suma].sum().reset_index()
+        _mostrar_tabla(resumen, etiquetas)
+        return
+    
+    _mostrar_tabla(df.head(MAX_FILAS_TABLA), etiquetas)
+    
+    anteriores = len(df) - MAX_FILAS_TABLA
+    if anteriores > 0:
+        st.caption(f"Mostrando los {MAX_FILAS_TABLA:,} registros más recientes de {len(df):,}")
+        # Un toggle y no un expander: el contenido de un expander se envía
+        # aunque esté cerrado, y aquí solo se quiere cargar a pedido
+        if st.toggle("Ver registros anteriores (paginado)", key=f"{key}_ver_mas"):
+            total_paginas = -(-anteriores // MAX_FILAS_TABLA)
+            pagina = st.number_input(
+                f"Página (de {total_paginas})",
+                min_value=1,
+                max_value=total_paginas,
+                step=1,
+                key=f"{key}_pagina"
+            )
+            inicio = MAX_FILAS_TABLA * pagina
+            _mostrar_tabla(df.iloc[inicio:inicio + MAX_FILAS_TABLA], etiquetas)
 
 
 class StockModule:
     """Clase principal del módulo de stock"""
     
+    categorias_huevos = CATEGORIAS_HUEVOS
+    
     def __init__(self):
         self.stock_repo = StockRepository(db)
         self.insumos_repo = InsumosRepository(db)
-        self.categorias_huevos = ['C', 'B', 'A', 'AA', 'AAA', 'Jumbo']
+    
+    def _escribir_y_refrescar(self, escritura, mensaje, error="❌ Error", **kwargs):
+        """
+        Ejecuta una escritura del repositorio, la confirma con un toast y
+        relanza la app completa.
+        
+        La escritura sube data_version, y con eso quedan invalidadas a la vez
+        todas las lecturas cacheadas de cualquier pestaña: no hace falta
+        limpiar cachés a mano. El toast, a diferencia de st.success, sigue
+        visible después del rerun.
+        
+        Args:
+            escritura: Método del repositorio a llamar con **kwargs
+            mensaje: Texto del toast si la escritura tiene éxito
+            error: Prefijo del mensaje si la escritura falla
+        """
+        try:
+            escritura(**kwargs)
+        except Exception as e:
+            st.error(f"{error}: {str(e)}")
+            return
+        st.toast(mensaje, icon="✅")
+        st.rerun()
     
     def render(self):
         """Renderiza la interfaz completa del módulo"""
@@ -41,6 +228,7 @@ class StockModule:
         with tabs[2]:
             self._render_movimientos()
     
+    @st.fragment
     def _render_stock_huevos(self):
         """Renderiza la gestión de stock de huevos"""
         st.subheader("🥚 Stock Actual de Huevos")
@@ -54,12 +242,11 @@ class StockModule:
                 st.markdown("### 📊 Inventario Actual")
                 
                 cols = st.columns(6)
-                categorias_db = ['tipo_c', 'tipo_b', 'tipo_a', 'tipo_aa', 'tipo_aaa', 'tipo_jumbo']
+                # Cantidades en el orden de CATEGORIAS_STOCK (cards y gráfico)
+                cantidades = [cantidad or 0 for cantidad in _cantidades_stock(stock)]
+                total_stock = sum(cantidades)
                 
-                total_stock = 0
-                for col, cat_db, cat_nombre in zip(cols, categorias_db, self.categorias_huevos):
-                    cantidad = stock.get(cat_db, 0) or 0
-                    total_stock += cantidad
+                for col, cantidad, cat_nombre in zip(cols, cantidades, self.categorias_huevos):
                     with col:
                         st.metric(
                             label=f"Tipo {cat_nombre}",
@@ -82,7 +269,7 @@ class StockModule:
                 # Preparar datos para el gráfico
                 datos_grafico = {
                     'Categoría': self.categorias_huevos,
-                    'Cantidad': [stock.get(cat, 0) or 0 for cat in categorias_db]
+                    'Cantidad': cantidades
                 }
                 df_grafico = pd.DataFrame(datos_grafico)
                 df_grafico = df_grafico[df_grafico['Cantidad'] > 0]  # Solo categorías con stock
@@ -91,25 +278,10 @@ class StockModule:
                     col_bar, col_pie = st.columns(2)
                     
                     with col_bar:
-                        fig_bar = px.bar(
-                            df_grafico,
-                            x='Categoría',
-                            y='Cantidad',
-                            title='Stock por Categoría',
-                            color='Categoría',
-                            text='Cantidad'
-                        )
-                        fig_bar.update_traces(textposition='outside')
-                        st.plotly_chart(fig_bar, use_container_width=True)
+                        st.plotly_chart(_figura_barras_huevos(df_grafico), use_container_width=True)
                     
                     with col_pie:
-                        fig_pie = go.Figure(data=[go.Pie(
-                            labels=df_grafico['Categoría'],
-                            values=df_grafico['Cantidad'],
-                            hole=0.3
-                        )])
-                        fig_pie.update_layout(title='Distribución Porcentual')
-                        st.plotly_chart(fig_pie, use_container_width=True)
+                        st.plotly_chart(_figura_torta_huevos(df_grafico), use_container_width=True)
                 
                 # Sección de ajustes
                 st.markdown("---")
@@ -127,107 +299,72 @@ class StockModule:
                 with col_form:
                     st.markdown(f"**{'Registrar Merma' if tipo_ajuste == 'merma' else 'Corrección de Inventario'}**")
                     
-                    cols_ajuste = st.columns(6)
-                    ajustes = {}
+                    # Los valores del formulario solo llegan al enviar: editar las
+                    # cantidades o el motivo no relanza el script
+                    with st.form("ajuste_huevos", clear_on_submit=True):
+                        cols_ajuste = st.columns(6)
+                        ajustes = {}
+                        
+                        for col, cat in zip(cols_ajuste, self.categorias_huevos):
+                            with col:
+                                if tipo_ajuste == 'merma':
+                                    ajustes[cat] = st.number_input(
+                                        f"{cat}",
+                                        min_value=0,
+                                        step=1,
+                                        value=0,
+                                        key=f"merma_{cat}",
+                                        help="Cantidad a descontar"
+                                    )
+                                else:
+                                    ajustes[cat] = st.number_input(
+                                        f"{cat}",
+                                        step=1,
+                                        value=0,
+                                        key=f"corr_{cat}",
+                                        help="Positivo: sumar, Negativo: restar"
+                                    )
+                        
+                        motivo = st.text_input(
+                            "Motivo del ajuste",
+                            placeholder="Ej: Huevos rotos en transporte, Error de conteo, etc.",
+                            key="motivo_ajuste"
+                        )
+                        
+                        col_btn1, col_btn2 = st.columns([1, 3])
+                        with col_btn1:
+                            aplicar_ajuste = st.form_submit_button("💾 Aplicar Ajuste", use_container_width=True)
                     
-                    for col, cat in zip(cols_ajuste, self.categorias_huevos):
-                        with col:
+                    if aplicar_ajuste:
+                        total_ajuste = sum(ajustes.values())
+                        
+                        if total_ajuste != 0 or tipo_ajuste == 'correccion':
+                            # Para mermas, convertir a negativo
                             if tipo_ajuste == 'merma':
-                                ajustes[cat] = st.number_input(
-                                    f"{cat}",
-                                    min_value=0,
-                                    step=1,
-                                    value=0,
-                                    key=f"merma_{cat}",
-                                    help="Cantidad a descontar"
-                                )
+                                ajustes_aplicar = {k: -v for k, v in ajustes.items()}
                             else:
-                                ajustes[cat] = st.number_input(
-                                    f"{cat}",
-                                    step=1,
-                                    value=0,
-                                    key=f"corr_{cat}",
-                                    help="Positivo: sumar, Negativo: restar"
-                                )
-                    
-                    motivo = st.text_input(
-                        "Motivo del ajuste",
-                        placeholder="Ej: Huevos rotos en transporte, Error de conteo, etc.",
-                        key="motivo_ajuste"
-                    )
-                    
-                    col_btn1, col_btn2 = st.columns([1, 3])
-                    with col_btn1:
-                        if st.button("💾 Aplicar Ajuste", use_container_width=True, key="btn_ajuste_huevos"):
-                            total_ajuste = sum(ajustes.values())
+                                ajustes_aplicar = ajustes
                             
-                            if total_ajuste != 0 or tipo_ajuste == 'correccion':
-                                try:
-                                    # Para mermas, convertir a negativo
-                                    if tipo_ajuste == 'merma':
-                                        ajustes_aplicar = {k: -v for k, v in ajustes.items()}
-                                    else:
-                                        ajustes_aplicar = ajustes
-                                    
-                                    # Aplicar ajuste
-                                    self.stock_repo.registrar_ajuste_huevos(
-                                        tipo_ajuste=tipo_ajuste,
-                                        tipo_c=ajustes_aplicar['C'],
-                                        tipo_b=ajustes_aplicar['B'],
-                                        tipo_a=ajustes_aplicar['A'],
-                                        tipo_aa=ajustes_aplicar['AA'],
-                                        tipo_aaa=ajustes_aplicar['AAA'],
-                                        tipo_jumbo=ajustes_aplicar['Jumbo'],
-                                        motivo=motivo if motivo else None
-                                    )
-                                    
-                                    st.success(f"✅ Ajuste aplicado exitosamente")
-                                    st.rerun()
-                                    
-                                except Exception as e:
-                                    st.error(f"❌ Error al aplicar ajuste: {str(e)}")
-                            else:
-                                st.warning("⚠️ Ingresa al menos un valor para ajustar")
+                            # Aplicar ajuste
+                            self._escribir_y_refrescar(
+                                self.stock_repo.registrar_ajuste_huevos,
+                                "Ajuste aplicado exitosamente",
+                                error="❌ Error al aplicar ajuste",
+                                tipo_ajuste=tipo_ajuste,
+                                tipo_c=ajustes_aplicar['C'],
+                                tipo_b=ajustes_aplicar['B'],
+                                tipo_a=ajustes_aplicar['A'],
+                                tipo_aa=ajustes_aplicar['AA'],
+                                tipo_aaa=ajustes_aplicar['AAA'],
+                                tipo_jumbo=ajustes_aplicar['Jumbo'],
+                                motivo=motivo if motivo else None
+                            )
+                        else:
+                            st.warning("⚠️ Ingresa al menos un valor para ajustar")
                 
-                # Historial de ajustes
+                # Historial de ajustes (fragmento propio)
                 st.markdown("---")
-                st.markdown("### 📜 Historial de Ajustes")
-                
-                col_hist1, col_hist2 = st.columns(2)
-                with col_hist1:
-                    fecha_inicio_hist = st.date_input(
-                        "Desde",
-                        value=date.today() - timedelta(days=30),
-                        key="hist_ajustes_inicio"
-                    )
-                with col_hist2:
-                    fecha_fin_hist = st.date_input(
-                        "Hasta",
-                        value=date.today(),
-                        key="hist_ajustes_fin"
-                    )
-                
-                historial = self.stock_repo.obtener_historial_ajustes_huevos(
-                    fecha_inicio_hist, fecha_fin_hist
-                )
-                
-                if historial:
-                    df_hist = pd.DataFrame(historial)
-                    df_hist['total_ajuste'] = (
-                        df_hist['tipo_c'] + df_hist['tipo_b'] + df_hist['tipo_a'] +
-                        df_hist['tipo_aa'] + df_hist['tipo_aaa'] + df_hist['tipo_jumbo']
-                    )
-                    
-                    # Renombrar para mostrar
-                    df_display = df_hist[['fecha', 'hora', 'tipo_ajuste', 'tipo_c', 'tipo_b', 
-                                          'tipo_a', 'tipo_aa', 'tipo_aaa', 'tipo_jumbo', 
-                                          'total_ajuste', 'motivo']].copy()
-                    df_display.columns = ['Fecha', 'Hora', 'Tipo', 'C', 'B', 'A', 'AA', 
-                                         'AAA', 'Jumbo', 'Total', 'Motivo']
-                    
-                    st.dataframe(df_display, use_container_width=True, hide_index=True)
-                else:
-                    st.info("ℹ️ No hay ajustes registrados en este período")
+                self._render_historial_ajustes()
             
             else:
                 st.warning("⚠️ No se pudo obtener el stock actual")
@@ -235,6 +372,44 @@ class StockModule:
         except Exception as e:
             st.error(f"❌ Error al cargar el stock de huevos: {str(e)}")
     
+    @st.fragment
+    def _render_historial_ajustes(self):
+        """
+        Historial de ajustes de huevos. Como fragmento, cambiar las fechas
+        solo vuelve a consultar el historial, sin redibujar stock ni gráficos.
+        """
+        st.markdown("### 📜 Historial de Ajustes")
+        
+        col_hist1, col_hist2 = st.columns(2)
+        with col_hist1:
+            fecha_inicio_hist = st.date_input(
+                "Desde",
+                value=date.today() - timedelta(days=30),
+                key="hist_ajustes_inicio"
+            )
+        with col_hist2:
+            fecha_fin_hist = st.date_input(
+                "Hasta",
+                value=date.today(),
+                key="hist_ajustes_fin"
+            )
+        
+        # Se reejecuta sin el try de _render_stock_huevos: captura sus errores
+        try:
+            df_hist = _cargar_historial_ajustes(
+                fecha_inicio_hist, fecha_fin_hist, db.data_version
+            )
+            
+            if not df_hist.empty:
+                _mostrar_historial(df_hist, ETIQUETAS_AJUSTES, ['fecha', 'tipo_ajuste'],
+                                   COLUMNAS_SUMA_AJUSTES, "hist_ajustes")
+            else:
+                st.info("ℹ️ No hay ajustes registrados en este período")
+            
+        except Exception as e:
+            st.error(f"❌ Error al cargar el historial de ajustes: {str(e)}")
+    
+    @st.fragment
     def _render_stock_insumos(self):
         """Renderiza la gestión de stock de insumos"""
         st.subheader("🌾 Stock de Insumos")
@@ -256,8 +431,10 @@ class StockModule:
                 # Mostrar stock por categoría
                 st.markdown("### 📊 Inventario de Insumos")
                 
-                # Convertir a DataFrame
+                # Convertir a DataFrame; 'categoria' como category: el filtro y el
+                # agrupado comparan códigos enteros en lugar de cadenas
                 df = pd.DataFrame(stock_insumos)
+                df['categoria'] = df['categoria'].astype('category')
                 
                 # Filtro por categoría
                 categorias_disponibles = df['categoria'].unique().tolist()
@@ -271,16 +448,13 @@ class StockModule:
                 df_filtrado = df[df['categoria'].isin(categoria_filtro)]
                 
                 # Mostrar tabla
-                df_display = df_filtrado[['nombre', 'categoria', 'cantidad_actual', 'stock_minimo', 'unidad']].copy()
-                df_display.columns = ['Insumo', 'Categoría', 'Stock Actual', 'Stock Mínimo', 'Unidad']
-                
-                st.dataframe(
-                    df_display,
-                    use_container_width=True,
-                    hide_index=True,
+                _mostrar_tabla(
+                    df_filtrado,
+                    {'nombre': 'Insumo', 'categoria': 'Categoría', 'cantidad_actual': 'Stock Actual',
+                     'stock_minimo': 'Stock Mínimo', 'unidad': 'Unidad'},
                     column_config={
-                        "Stock Actual": st.column_config.NumberColumn(format="%.2f"),
-                        "Stock Mínimo": st.column_config.NumberColumn(format="%.2f")
+                        'cantidad_actual': st.column_config.NumberColumn("Stock Actual", format="%.2f"),
+                        'stock_minimo': st.column_config.NumberColumn("Stock Mínimo", format="%.2f")
                     }
                 )
                 
@@ -288,23 +462,21 @@ class StockModule:
                 st.markdown("---")
                 st.markdown("### 📈 Stock por Categoría")
                 
-                stock_por_categoria = df_filtrado.groupby('categoria')['cantidad_actual'].sum().reset_index()
+                # observed=True: solo las categorías que quedaron tras el filtro
+                stock_por_categoria = df_filtrado.groupby('categoria', observed=True)['cantidad_actual'].sum().reset_index()
                 stock_por_categoria.columns = ['Categoría', 'Cantidad Total']
                 
                 if not stock_por_categoria.empty:
-                    fig = px.bar(
-                        stock_por_categoria,
-                        x='Categoría',
-                        y='Cantidad Total',
-                        title='Stock Total por Categoría',
-                        color='Categoría'
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                    st.plotly_chart(_figura_stock_insumos(stock_por_categoria), use_container_width=True)
                 
                 # Sección de gestión
                 st.markdown("---")
                 st.markdown("### ⚙️ Gestión de Insumos")
                 
+                # Datos de cada insumo por id: las etiquetas de los selectbox y el
+                # insumo elegido se leen de aquí sin filtrar el DataFrame cada vez
+                info_insumos = {item['insumo_id']: item for item in stock_insumos}
+                
                 tab_consumo, tab_ajuste, tab_minimos = st.tabs([
                     "📤 Registrar Consumo/Salida",
                     "✏️ Ajustar Stock",
@@ -317,49 +489,49 @@ class StockModule:
                     
                     insumo_seleccionado = st.selectbox(
                         "Selecciona el insumo",
-                        options=df['insumo_id'].tolist(),
-                        format_func=lambda x: f"{df[df['insumo_id']==x]['nombre'].iloc[0]} - Stock: {df[df['insumo_id']==x]['cantidad_actual'].iloc[0]} {df[df['insumo_id']==x]['unidad'].iloc[0]}",
+                        options=list(info_insumos),
+                        format_func=lambda x: f"{info_insumos[x]['nombre']} - Stock: {info_insumos[x]['cantidad_actual']} {info_insumos[x]['unidad']}",
                         key="consumo_insumo_select"
                     )
                     
                     if insumo_seleccionado:
-                        insumo_data = df[df['insumo_id'] == insumo_seleccionado].iloc[0]
+                        insumo_data = info_insumos[insumo_seleccionado]
                         
-                        col_cant, col_mot = st.columns([1, 2])
-                        
-                        with col_cant:
-                            cantidad_consumo = st.number_input(
-                                f"Cantidad ({insumo_data['unidad']})",
-                                min_value=0.0,
-                                step=1.0,
-                                max_value=float(insumo_data['cantidad_actual']),
-                                value=0.0,
-                                key="cantidad_consumo"
-                            )
-                        
-                        with col_mot:
-                            motivo_consumo = st.text_input(
-                                "Motivo",
-                                placeholder="Ej: Consumo diario, Uso en mantenimiento, etc.",
-                                key="motivo_consumo"
-                            )
-                        
-                        if cantidad_consumo > 0:
-                            nuevo_stock = insumo_data['cantidad_actual'] - cantidad_consumo
-                            st.info(f"📊 Nuevo stock: {nuevo_stock:.2f} {insumo_data['unidad']}")
+                        with st.form("form_consumo_insumo", clear_on_submit=True):
+                            col_cant, col_mot = st.columns([1, 2])
+                            
+                            with col_cant:
+                                cantidad_consumo = st.number_input(
+                                    f"Cantidad ({insumo_data['unidad']})",
+                                    min_value=0.0,
+                                    step=1.0,
+                                    max_value=float(insumo_data['cantidad_actual']),
+                                    value=0.0,
+                                    key="cantidad_consumo"
+                                )
+                            
+                            with col_mot:
+                                motivo_consumo = st.text_input(
+                                    "Motivo",
+                                    placeholder="Ej: Consumo diario, Uso en mantenimiento, etc.",
+                                    key="motivo_consumo"
+                                )
+                            
+                            registrar_consumo = st.form_submit_button("💾 Registrar Consumo")
                         
-                        if st.button("💾 Registrar Consumo", key="btn_consumo"):
+                        if registrar_consumo:
                             if cantidad_consumo > 0:
-                                try:
-                                    self.stock_repo.registrar_consumo_insumo(
-                                        insumo_id=insumo_seleccionado,
-                                        cantidad=cantidad_consumo,
-                                        motivo=motivo_consumo if motivo_consumo else None
-                                    )
-                                    st.success(f"✅ Consumo registrado: {cantidad_consumo} {insumo_data['unidad']}")
-                                    st.rerun()
-                                except Exception as e:
-                                    st.error(f"❌ Error: {str(e)}")
+                                # El nuevo stock se informa al enviar: dentro del
+                                # formulario no hay aviso en vivo
+                                nuevo_stock = insumo_data['cantidad_actual'] - cantidad_consumo
+                                self._escribir_y_refrescar(
+                                    self.stock_repo.registrar_consumo_insumo,
+                                    f"Consumo registrado: {cantidad_consumo} {insumo_data['unidad']} "
+                                    f"(nuevo stock: {nuevo_stock:.2f} {insumo_data['unidad']})",
+                                    insumo_id=insumo_seleccionado,
+                                    cantidad=cantidad_consumo,
+                                    motivo=motivo_consumo if motivo_consumo else None
+                                )
                             else:
                                 st.warning("⚠️ Ingresa una cantidad mayor a 0")
                 
@@ -369,46 +541,43 @@ class StockModule:
                     
                     insumo_ajuste = st.selectbox(
                         "Selecciona el insumo",
-                        options=df['insumo_id'].tolist(),
-                        format_func=lambda x: f"{df[df['insumo_id']==x]['nombre'].iloc[0]} - Stock actual: {df[df['insumo_id']==x]['cantidad_actual'].iloc[0]} {df[df['insumo_id']==x]['unidad'].iloc[0]}",
+                        options=list(info_insumos),
+                        format_func=lambda x: f"{info_insumos[x]['nombre']} - Stock actual: {info_insumos[x]['cantidad_actual']} {info_insumos[x]['unidad']}",
                         key="ajuste_insumo_select"
                     )
                     
                     if insumo_ajuste:
-                        insumo_data_ajuste = df[df['insumo_id'] == insumo_ajuste].iloc[0]
+                        insumo_data_ajuste = info_insumos[insumo_ajuste]
                         
                         st.info(f"📦 Stock actual: {insumo_data_ajuste['cantidad_actual']} {insumo_data_ajuste['unidad']}")
                         
-                        nueva_cantidad = st.number_input(
-                            f"Nueva cantidad ({insumo_data_ajuste['unidad']})",
-                            min_value=0.0,
-                            step=1.0,
-                            value=float(insumo_data_ajuste['cantidad_actual']),
-                            key="nueva_cantidad_ajuste"
-                        )
-                        
-                        motivo_ajuste = st.text_input(
-                            "Motivo del ajuste",
-                            placeholder="Ej: Corrección de inventario, Error de registro, etc.",
-                            key="motivo_ajuste_insumo"
-                        )
-                        
-                        diferencia = nueva_cantidad - insumo_data_ajuste['cantidad_actual']
-                        if diferencia != 0:
-                            color = "🔼" if diferencia > 0 else "🔽"
-                            st.warning(f"{color} Diferencia: {diferencia:+.2f} {insumo_data_ajuste['unidad']}")
+                        with st.form("form_ajuste_insumo", clear_on_submit=True):
+                            nueva_cantidad = st.number_input(
+                                f"Nueva cantidad ({insumo_data_ajuste['unidad']})",
+                                min_value=0.0,
+                                step=1.0,
+                                value=float(insumo_data_ajuste['cantidad_actual']),
+                                key="nueva_cantidad_ajuste"
+                            )
+                            
+                            motivo_ajuste = st.text_input(
+                                "Motivo del ajuste",
+                                placeholder="Ej: Corrección de inventario, Error de registro, etc.",
+                                key="motivo_ajuste_insumo"
+                            )
+                            
+                            aplicar_ajuste_insumo = st.form_submit_button("💾 Aplicar Ajuste")
                         
-                        if st.button("💾 Aplicar Ajuste", key="btn_ajuste_stock"):
-                            try:
-                                self.stock_repo.ajustar_stock_insumo(
-                                    insumo_id=insumo_ajuste,
-                                    nueva_cantidad=nueva_cantidad,
-                                    motivo=motivo_ajuste if motivo_ajuste else "Ajuste manual"
-                                )
-                                st.success(f"✅ Stock ajustado a {nueva_cantidad} {insumo_data_ajuste['unidad']}")
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"❌ Error: {str(e)}")
+                        if aplicar_ajuste_insumo:
+                            diferencia = nueva_cantidad - insumo_data_ajuste['cantidad_actual']
+                            self._escribir_y_refrescar(
+                                self.stock_repo.ajustar_stock_insumo,
+                                f"Stock ajustado a {nueva_cantidad} {insumo_data_ajuste['unidad']} "
+                                f"(diferencia: {diferencia:+.2f})",
+                                insumo_id=insumo_ajuste,
+                                nueva_cantidad=nueva_cantidad,
+                                motivo=motivo_ajuste if motivo_ajuste else "Ajuste manual"
+                            )
                 
                 # Tab 3: Actualizar mínimos
                 with tab_minimos:
@@ -416,34 +585,34 @@ class StockModule:
                     
                     insumo_minimo = st.selectbox(
                         "Selecciona el insumo",
-                        options=df['insumo_id'].tolist(),
-                        format_func=lambda x: f"{df[df['insumo_id']==x]['nombre'].iloc[0]} - Mínimo actual: {df[df['insumo_id']==x]['stock_minimo'].iloc[0]} {df[df['insumo_id']==x]['unidad'].iloc[0]}",
+                        options=list(info_insumos),
+                        format_func=lambda x: f"{info_insumos[x]['nombre']} - Mínimo actual: {info_insumos[x]['stock_minimo']} {info_insumos[x]['unidad']}",
                         key="minimo_insumo_select"
                     )
                     
                     if insumo_minimo:
-                        insumo_data_minimo = df[df['insumo_id'] == insumo_minimo].iloc[0]
+                        insumo_data_minimo = info_insumos[insumo_minimo]
                         
                         st.info(f"⚠️ Stock mínimo actual: {insumo_data_minimo['stock_minimo']} {insumo_data_minimo['unidad']}")
                         
-                        nuevo_minimo = st.number_input(
-                            f"Nuevo stock mínimo ({insumo_data_minimo['unidad']})",
-                            min_value=0.0,
-                            step=1.0,
-                            value=float(insumo_data_minimo['stock_minimo']),
-                            key="nuevo_minimo"
-                        )
+                        with st.form("form_minimo_insumo", clear_on_submit=True):
+                            nuevo_minimo = st.number_input(
+                                f"Nuevo stock mínimo ({insumo_data_minimo['unidad']})",
+                                min_value=0.0,
+                                step=1.0,
+                                value=float(insumo_data_minimo['stock_minimo']),
+                                key="nuevo_minimo"
+                            )
+                            
+                            actualizar_minimo = st.form_submit_button("💾 Actualizar Mínimo")
                         
-                        if st.button("💾 Actualizar Mínimo", key="btn_actualizar_minimo"):
-                            try:
-                                self.stock_repo.actualizar_stock_minimo(
-                                    insumo_id=insumo_minimo,
-                                    stock_minimo=nuevo_minimo
-                                )
-                                st.success(f"✅ Stock mínimo actualizado a {nuevo_minimo} {insumo_data_minimo['unidad']}")
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"❌ Error: {str(e)}")
+                        if actualizar_minimo:
+                            self._escribir_y_refrescar(
+                                self.stock_repo.actualizar_stock_minimo,
+                                f"Stock mínimo actualizado a {nuevo_minimo} {insumo_data_minimo['unidad']}",
+                                insumo_id=insumo_minimo,
+                                stock_minimo=nuevo_minimo
+                            )
             
             else:
                 st.info("ℹ️ No hay insumos registrados en el sistema")
@@ -452,6 +621,7 @@ class StockModule:
         except Exception as e:
             st.error(f"❌ Error al cargar stock de insumos: {str(e)}")
     
+    @st.fragment
     def _render_movimientos(self):
         """Renderiza el historial de movimientos"""
         st.subheader("📋 Historial de Movimientos")
@@ -478,38 +648,28 @@ class StockModule:
         
         with tab_ajustes:
             try:
-                historial_ajustes = self.stock_repo.obtener_historial_ajustes_huevos(
-                    fecha_inicio, fecha_fin
-                )
+                # Las métricas se agregan en SQL, sin recorrer el historial
+                resumen = self.stock_repo.obtener_resumen_ajustes(fecha_inicio, fecha_fin)
                 
-                if historial_ajustes:
-                    df = pd.DataFrame(historial_ajustes)
-                    df['total'] = (
-                        df['tipo_c'] + df['tipo_b'] + df['tipo_a'] +
-                        df['tipo_aa'] + df['tipo_aaa'] + df['tipo_jumbo']
-                    )
+                if resumen:
+                    mermas = resumen.get('merma', {})
+                    correcciones = resumen.get('correccion', {})
                     
                     # Métricas
                     col_m1, col_m2, col_m3 = st.columns(3)
                     with col_m1:
-                        st.metric("Total Ajustes", len(df))
+                        st.metric("Total Ajustes", sum(r['ajustes'] for r in resumen.values()))
                     with col_m2:
-                        total_mermas = df[df['tipo_ajuste'] == 'merma']['total'].sum()
-                        st.metric("Total Mermas", f"{abs(total_mermas):,}")
+                        st.metric("Total Mermas", f"{abs(mermas.get('total', 0)):,}")
                     with col_m3:
-                        total_correcciones = df[df['tipo_ajuste'] == 'correccion']['total'].sum()
-                        st.metric("Total Correcciones", f"{total_correcciones:+,}")
+                        st.metric("Total Correcciones", f"{correcciones.get('total', 0):+,}")
                     
                     st.markdown("---")
                     
                     # Tabla
-                    df_display = df[['fecha', 'hora', 'tipo_ajuste', 'tipo_c', 'tipo_b', 
-                                    'tipo_a', 'tipo_aa', 'tipo_aaa', 'tipo_jumbo', 
-                                    'total', 'motivo']].copy()
-                    df_display.columns = ['Fecha', 'Hora', 'Tipo', 'C', 'B', 'A', 'AA', 
-                                         'AAA', 'Jumbo', 'Total', 'Motivo']
-                    
-                    st.dataframe(df_display, use_container_width=True, hide_index=True)
+                    df = _cargar_historial_ajustes(fecha_inicio, fecha_fin, db.data_version)
+                    _mostrar_historial(df, ETIQUETAS_AJUSTES, ['fecha', 'tipo_ajuste'],
+                                       COLUMNAS_SUMA_AJUSTES, "mov_ajustes")
                 else:
                     st.info("ℹ️ No hay ajustes en este período")
             
@@ -523,7 +683,7 @@ class StockModule:
                 )
                 
                 if historial_insumos:
-                    df = pd.DataFrame(historial_insumos)
+                    df = pd.DataFrame(historial_insumos, columns=historial_insumos[0].keys())
                     
                     # Métricas
                     col_m1, col_m2 = st.columns(2)
@@ -535,13 +695,10 @@ class StockModule:
                     
                     st.markdown("---")
                     
-                    # Tabla
-                    df_display = df[['fecha', 'hora', 'insumo_nombre', 'categoria', 
-                                    'tipo_movimiento', 'cantidad', 'unidad', 'motivo']].copy()
-                    df_display.columns = ['Fecha', 'Hora', 'Insumo', 'Categoría', 
-                                         'Tipo', 'Cantidad', 'Unidad', 'Motivo']
-                    
-                    st.dataframe(df_display, use_container_width=True, hide_index=True)
+                    # Tabla; resumen por insumo: las cantidades solo se suman en la misma unidad
+                    _mostrar_historial(df, ETIQUETAS_MOVIMIENTOS_INSUMOS,
+                                       ['fecha', 'insumo_nombre', 'tipo_movimiento', 'unidad'],
+                                       ['cantidad'], "mov_insumos")
                 else:
                     st.info("ℹ️ No hay movimientos en este período")
             
@@ -549,11 +706,20 @@ class StockModule:
                 st.error(f"❌ Error: {str(e)}")
 
 
+@st.cache_resource
+def _get_module():
+    """
+    StockModule compartido entre reruns y sesiones: solo guarda los
+    repositorios (sin estado por sesión), así que basta crearlo una vez.
+    """
+    return StockModule()
+
+
 # Función principal para llamar desde app.py
+@st.fragment
 def render_stock():
     """Función principal que se llama desde app.py"""
-    module = StockModule()
-    module.render()
+    _get_module().render()
 
 
 # Para testing en Jupyter
@@ -3,18 +3,118 @@ Módulo de Ventas
 Gestiona pedidos, despachos y ventas de huevos por canastillas
 """
 
+import io
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
+from operator import itemgetter, mul
 from typing import Dict, List
 
 # Importar la base de datos y repositorios
 import sys
 sys.path.append('..')
-from data.database import db
-from data.models import PedidosRepository, ClientesRepository, PreciosRepository, StockRepository
+from data.database import get_db
+from data.models import (PedidosRepository, ClientesRepository, PreciosRepository,
+                         StockRepository, ReportesRepository, CATEGORIAS_STOCK)
+
+# Database memoriza las lecturas entre reruns; las escrituras invalidan el caché
+db = get_db()
+
+# Opciones de ventas por página en el detalle del historial
+TAMANOS_PAGINA = [50, 100, 250, 500]
+
+# Columnas de precio (por huevo) en el orden de las categorías; los
+# itemgetter leen las 6 columnas de una fila en una sola llamada
+COLUMNAS_PRECIOS = ('precio_c', 'precio_b', 'precio_a', 'precio_aa', 'precio_aaa', 'precio_jumbo')
+COLUMNAS_CANASTILLAS = ('canastillas_c', 'canastillas_b', 'canastillas_a',
+                        'canastillas_aa', 'canastillas_aaa', 'canastillas_jumbo')
+_cantidades_stock = itemgetter(*CATEGORIAS_STOCK)
+_precios_por_huevo = itemgetter(*COLUMNAS_PRECIOS)
+_canastillas_pedido = itemgetter(*COLUMNAS_CANASTILLAS)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cargar_historial_ventas(fecha_inicio, fecha_fin, data_version, limite=-1, offset=0):
+    """
+    DataFrame de las ventas completadas del período (o de una página),
+    memorizado entre reruns. data_version forma parte de la clave: una
+    escritura lo invalida.
+    """
+    ventas = PedidosRepository(db).obtener_historial_ventas(
+        fecha_inicio, fecha_fin, limite, offset
+    )
+    if not ventas:
+        return pd.DataFrame()
+    return pd.DataFrame(ventas, columns=ventas[0].keys())
+
+
+@st.cache_data(ttl=120, max_entries=20, show_spinner=False)
+def _figuras_historial_ventas(fecha_inicio, fecha_fin, data_version):
+    """
+    Figuras del historial de ventas (ingresos por día y top 5 clientes),
+    memorizadas por período y versión de datos: un rerun con los mismos
+    filtros no vuelve a construirlas.
+    
+    Returns:
+        tuple: (fig_ventas, fig_clientes)
+    """
+    # Plotly solo se importa al graficar: las demás secciones no lo necesitan
+    import plotly.express as px
+    
+    reportes_repo = ReportesRepository(db)
+    
+    df_diarias = pd.DataFrame(reportes_repo.obtener_ventas_diarias_periodo(fecha_inicio, fecha_fin))
+    df_diarias['fecha'] = pd.to_datetime(df_diarias['fecha'], format='%Y-%m-%d')
+    fig_ventas = px.line(
+        df_diarias,
+        x='fecha',
+        y='total_ingresos',
+        title='Ingresos por Día',
+        labels={'fecha': 'Fecha', 'total_ingresos': 'Ingresos ($)'},
+        markers=True
+    )
+    
+    top_clientes = reportes_repo.obtener_top_clientes(fecha_inicio, fecha_fin, limit=5)
+    fig_clientes = px.bar(
+        x=[cliente['total_comprado'] for cliente in top_clientes],
+        y=[cliente['nombre'] for cliente in top_clientes],
+        orientation='h',
+        title='Top 5 Clientes',
+        labels={'x': 'Total Comprado ($)', 'y': 'Cliente'}
+    )
+    
+    return fig_ventas, fig_clientes
+
+
+def _tabla_ventas(df):
+    """Columnas del detalle de ventas, renombradas para mostrar o exportar"""
+    df_display = df[[
+        'id', 'fecha', 'cliente_nombre', 'canastillas_c', 'canastillas_b',
+        'canastillas_a', 'canastillas_aa', 'canastillas_aaa', 'canastillas_jumbo',
+        'total_canastillas', 'precio_total'
+    ]].copy()
+    
+    df_display.columns = [
+        'ID', 'Fecha', 'Cliente', 'C', 'B', 'A', 'AA', 'AAA', 'Jumbo',
+        'Total Can.', 'Total $'
+    ]
+    return df_display
+
+
+@st.cache_data(ttl=300, max_entries=20, show_spinner=False)
+def _generar_csv_ventas(fecha_inicio, fecha_fin, data_version):
+    """
+    Bytes del CSV de ventas del período: se serializa una sola vez por
+    período (y versión de datos), no en cada clic de exportar. El CSV lo
+    escribe pyarrow (dependencia de Streamlit), en C en lugar de to_csv.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    
+    df = _tabla_ventas(_cargar_historial_ventas(fecha_inicio, fecha_fin, data_version))
+    buffer = io.BytesIO()
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    return buffer.getvalue()
 
 
 class VentasModule:
@@ -25,6 +125,7 @@ class VentasModule:
         self.clientes_repo = ClientesRepository(db)
         self.precios_repo = PreciosRepository(db)
         self.stock_repo = StockRepository(db)
+        self.reportes_repo = ReportesRepository(db)
         self.categorias = ['C', 'B', 'A', 'AA', 'AAA', 'Jumbo']
         self.HUEVOS_POR_CANASTILLA = 30
     
@@ -32,31 +133,37 @@ class VentasModule:
         """Renderiza la interfaz completa del módulo"""
         st.header("🚚 Gestión de Ventas")
         
-        # Crear tabs
-        tabs = st.tabs(["🛒 Crear Pedido", "📦 Despachar Pedidos", "📊 Historial de Ventas", "👥 Clientes"])
-        
-        with tabs[0]:
-            self._render_crear_pedido()
-        
-        with tabs[1]:
-            self._render_despachar_pedidos()
-        
-        with tabs[2]:
-            self._render_historial_ventas()
-        
-        with tabs[3]:
-            self._render_gestion_clientes()
+        # Selector de sección en lugar de st.tabs: st.tabs ejecuta las cuatro
+        # secciones (con sus consultas y gráficos) en cada rerun, aunque solo
+        # se vea una; con el radio solo se ejecuta la sección elegida
+        secciones = {
+            "🛒 Crear Pedido": self._render_crear_pedido,
+            "📦 Despachar Pedidos": self._render_despachar_pedidos,
+            "📊 Historial de Ventas": self._render_historial_ventas,
+            "👥 Clientes": self._render_gestion_clientes,
+        }
+        seccion = st.radio(
+            "Sección",
+            options=list(secciones),
+            horizontal=True,
+            label_visibility="collapsed",
+            key="ventas_tab"
+        )
+        secciones[seccion]()
     
     def _calcular_canastillas_disponibles(self, stock: Dict) -> Dict:
         """Calcula cuántas canastillas completas hay disponibles por categoría"""
-        categorias_db = ['tipo_c', 'tipo_b', 'tipo_a', 'tipo_aa', 'tipo_aaa', 'tipo_jumbo']
-        canastillas = {}
-        
-        for cat_db, cat_nombre in zip(categorias_db, self.categorias):
-            huevos = stock.get(cat_db, 0) or 0
-            canastillas[cat_nombre] = huevos // self.HUEVOS_POR_CANASTILLA
-            
-        return canastillas
+        huevos = _cantidades_stock(stock) if stock else (0,) * len(self.categorias)
+        return {
+            cat: (cantidad or 0) // self.HUEVOS_POR_CANASTILLA
+            for cat, cantidad in zip(self.categorias, huevos)
+        }
+    
+    def _precios_canastilla(self, precios: Dict) -> tuple:
+        """Precio de una canastilla de cada categoría (en el orden de self.categorias)"""
+        if not precios:
+            return (0,) * len(self.categorias)
+        return tuple((precio or 0) * self.HUEVOS_POR_CANASTILLA for precio in _precios_por_huevo(precios))
     
     def _render_crear_pedido(self):
         """Renderiza el formulario para crear un nuevo pedido"""
@@ -97,10 +204,12 @@ class VentasModule:
                 clientes = self.clientes_repo.obtener_clientes_activos()
                 
                 if clientes:
+                    # Nombre por id: format_func no recorre la lista por cada opción
+                    nombres_clientes = {c['id']: c['nombre'] for c in clientes}
                     cliente_seleccionado = st.selectbox(
                         "Seleccionar cliente",
-                        options=[c['id'] for c in clientes],
-                        format_func=lambda x: next((c['nombre'] for c in clientes if c['id'] == x), ""),
+                        options=list(nombres_clientes),
+                        format_func=nombres_clientes.get,
                         key="select_cliente"
                     )
                 else:
@@ -154,158 +263,161 @@ class VentasModule:
             # Sección de pedido
             st.markdown("### 📝 Detalles del Pedido")
             
-            # Información de fecha
-            col_fecha, col_hora = st.columns(2)
-            with col_fecha:
-                fecha_pedido = st.date_input(
-                    "Fecha del pedido",
-                    value=date.today(),
-                    key="fecha_pedido"
-                )
-            with col_hora:
-                hora_pedido = st.time_input(
-                    "Hora del pedido",
-                    value=datetime.now().time(),
-                    key="hora_pedido"
-                )
-            
-            st.markdown("**Cantidad de canastillas por categoría:**")
-            
-            # Inputs de canastillas
-            cols_cant = st.columns(6)
-            canastillas_pedido = {}
-            precios_categoria = {}
-            
-            categorias_db_precios = ['precio_c', 'precio_b', 'precio_a', 'precio_aa', 'precio_aaa', 'precio_jumbo']
-            
-            for col, cat, precio_db in zip(cols_cant, self.categorias, categorias_db_precios):
-                with col:
-                    max_canastillas = canastillas_disponibles[cat]
-                    precio_unitario = precios.get(precio_db, 0)
-                    precio_canastilla = precio_unitario * self.HUEVOS_POR_CANASTILLA
-                    
-                    canastillas_pedido[cat] = st.number_input(
-                        f"📦 {cat}",
-                        min_value=0,
-                        max_value=max_canastillas,
-                        step=1,
-                        value=0,
-                        key=f"cant_{cat}",
-                        help=f"Disponibles: {max_canastillas} - Precio: ${precio_canastilla:,.0f}/canastilla"
+            # Los valores del formulario solo llegan al enviar: editar cantidades,
+            # precio u observaciones no relanza el script. "Calcular" envía el
+            # formulario para actualizar el resumen y es obligatorio antes de procesar
+            with st.form("form_pedido", clear_on_submit=False):
+                # Información de fecha
+                col_fecha, col_hora = st.columns(2)
+                with col_fecha:
+                    fecha_pedido = st.date_input(
+                        "Fecha del pedido",
+                        value=date.today(),
+                        key="fecha_pedido"
                     )
-                    
-                    precios_categoria[cat] = precio_canastilla
-            
-            # Calcular totales
-            total_canastillas = sum(canastillas_pedido.values())
-            subtotales = {cat: canastillas_pedido[cat] * precios_categoria[cat] for cat in self.categorias}
-            total_precio = sum(subtotales.values())
-            
-            # Mostrar resumen
-            if total_canastillas > 0:
-                st.markdown("---")
-                st.markdown("### 💰 Resumen del Pedido")
+                with col_hora:
+                    hora_pedido = st.time_input(
+                        "Hora del pedido",
+                        value=datetime.now().time(),
+                        key="hora_pedido"
+                    )
+                
+                st.markdown("**Cantidad de canastillas por categoría:**")
                 
-                col_res1, col_res2 = st.columns(2)
+                # Inputs de canastillas
+                cols_cant = st.columns(6)
+                canastillas_pedido = {}
+                precios_canastilla = self._precios_canastilla(precios)
                 
-                with col_res1:
-                    st.markdown("**Cantidades:**")
-                    for cat in self.categorias:
-                        if canastillas_pedido[cat] > 0:
-                            huevos = canastillas_pedido[cat] * self.HUEVOS_POR_CANASTILLA
-                            st.write(f"• {cat}: {canastillas_pedido[cat]} canastillas ({huevos} huevos)")
-                    st.write(f"**Total: {total_canastillas} canastillas ({total_canastillas * self.HUEVOS_POR_CANASTILLA} huevos)**")
+                for col, cat, precio_canastilla in zip(cols_cant, self.categorias, precios_canastilla):
+                    with col:
+                        max_canastillas = canastillas_disponibles[cat]
+                        
+                        canastillas_pedido[cat] = st.number_input(
+                            f"📦 {cat}",
+                            min_value=0,
+                            max_value=max_canastillas,
+                            step=1,
+                            value=0,
+                            key=f"cant_{cat}",
+                            help=f"Disponibles: {max_canastillas} - Precio: ${precio_canastilla:,.0f}/canastilla"
+                        )
                 
-                with col_res2:
-                    st.markdown("**Valores:**")
-                    for cat in self.categorias:
-                        if subtotales[cat] > 0:
-                            st.write(f"• {cat}: ${subtotales[cat]:,.0f}")
-                    st.markdown(f"### **Total: ${total_precio:,.0f}**")
+                # Calcular totales
+                total_canastillas = sum(canastillas_pedido.values())
+                subtotales = dict(zip(self.categorias, map(mul, canastillas_pedido.values(), precios_canastilla)))
+                total_precio = sum(subtotales.values())
+                precio_ajustado = total_precio
+                
+                # Mostrar resumen (de las cantidades del último envío)
+                if total_canastillas > 0:
+                    st.markdown("---")
+                    st.markdown("### 💰 Resumen del Pedido")
+                    
+                    col_res1, col_res2 = st.columns(2)
+                    
+                    with col_res1:
+                        st.markdown("**Cantidades:**")
+                        for cat in self.categorias:
+                            if canastillas_pedido[cat] > 0:
+                                huevos = canastillas_pedido[cat] * self.HUEVOS_POR_CANASTILLA
+                                st.write(f"• {cat}: {canastillas_pedido[cat]} canastillas ({huevos} huevos)")
+                        st.write(f"**Total: {total_canastillas} canastillas ({total_canastillas * self.HUEVOS_POR_CANASTILLA} huevos)**")
+                    
+                    with col_res2:
+                        st.markdown("**Valores:**")
+                        for cat in self.categorias:
+                            if subtotales[cat] > 0:
+                                st.write(f"• {cat}: ${subtotales[cat]:,.0f}")
+                        st.markdown(f"### **Total: ${total_precio:,.0f}**")
+                    
+                    # Ajuste manual de precio
+                    st.markdown("---")
+                    col_ajuste1, col_ajuste2 = st.columns([2, 1])
+                    
+                    with col_ajuste1:
+                        precio_ajustado = st.number_input(
+                            "Ajustar precio total (opcional)",
+                            min_value=0.0,
+                            value=float(total_precio),
+                            step=1000.0,
+                            key="precio_ajustado",
+                            help="Modifica el precio si hay descuentos o ajustes especiales"
+                        )
+                    
+                    with col_ajuste2:
+                        if precio_ajustado != total_precio:
+                            diferencia = precio_ajustado - total_precio
+                            color = "🟢" if diferencia < 0 else "🔴"
+                            st.metric("Ajuste", f"{color} ${diferencia:+,.0f}")
+                
+                # Observaciones
+                observaciones = st.text_area(
+                    "Observaciones (opcional)",
+                    placeholder="Ej: Cliente prefiere entrega en la tarde, pedido especial, etc.",
+                    key="obs_pedido"
+                )
                 
-                # Ajuste manual de precio
+                # Opciones de guardado
                 st.markdown("---")
-                col_ajuste1, col_ajuste2 = st.columns([2, 1])
+                col_tipo_pedido, col_btn = st.columns([2, 1])
                 
-                with col_ajuste1:
-                    precio_ajustado = st.number_input(
-                        "Ajustar precio total (opcional)",
-                        min_value=0.0,
-                        value=float(total_precio),
-                        step=1000.0,
-                        key="precio_ajustado",
-                        help="Modifica el precio si hay descuentos o ajustes especiales"
+                with col_tipo_pedido:
+                    tipo_pedido = st.radio(
+                        "¿Cómo deseas procesar este pedido?",
+                        options=['pendiente', 'despachar_ahora'],
+                        format_func=lambda x: '📋 Guardar como pendiente (despachar después)' if x == 'pendiente' else '✅ Despachar inmediatamente',
+                        key="tipo_pedido"
                     )
                 
-                with col_ajuste2:
-                    if precio_ajustado != total_precio:
-                        diferencia = precio_ajustado - total_precio
-                        color = "🟢" if diferencia < 0 else "🔴"
-                        st.metric("Ajuste", f"{color} ${diferencia:+,.0f}")
-            
-            # Observaciones
-            observaciones = st.text_area(
-                "Observaciones (opcional)",
-                placeholder="Ej: Cliente prefiere entrega en la tarde, pedido especial, etc.",
-                key="obs_pedido"
-            )
-            
-            # Opciones de guardado
-            st.markdown("---")
-            col_tipo_pedido, col_btn = st.columns([2, 1])
-            
-            with col_tipo_pedido:
-                tipo_pedido = st.radio(
-                    "¿Cómo deseas procesar este pedido?",
-                    options=['pendiente', 'despachar_ahora'],
-                    format_func=lambda x: '📋 Guardar como pendiente (despachar después)' if x == 'pendiente' else '✅ Despachar inmediatamente',
-                    key="tipo_pedido"
-                )
-            
-            with col_btn:
-                st.write("")
-                st.write("")
-                if total_canastillas > 0:
-                    if st.button("💾 Procesar Pedido", use_container_width=True, type="primary", key="btn_crear_pedido"):
-                        try:
-                            # Crear el pedido
-                            pedido_id = self.pedidos_repo.crear_pedido(
-                                cliente_id=cliente_seleccionado,
-                                fecha=fecha_pedido,
-                                hora=hora_pedido.strftime("%H:%M:%S"),
-                                canastillas_c=canastillas_pedido['C'],
-                                canastillas_b=canastillas_pedido['B'],
-                                canastillas_a=canastillas_pedido['A'],
-                                canastillas_aa=canastillas_pedido['AA'],
-                                canastillas_aaa=canastillas_pedido['AAA'],
-                                canastillas_jumbo=canastillas_pedido['Jumbo'],
-                                precio_total=precio_ajustado if total_canastillas > 0 else total_precio,
-                                observaciones=observaciones if observaciones else None
+                with col_btn:
+                    calcular = st.form_submit_button("🧮 Calcular", use_container_width=True)
+                    procesar = st.form_submit_button("💾 Procesar Pedido", use_container_width=True, type="primary")
+            
+            # El resumen y el precio ajustado corresponden al último "Calcular":
+            # si las cantidades cambiaron desde entonces no se procesa el pedido
+            cantidades = tuple(canastillas_pedido.values())
+            if calcular:
+                st.session_state['pedido_calculado'] = cantidades
+            
+            if procesar:
+                if total_canastillas > 0 and st.session_state.get('pedido_calculado') != cantidades:
+                    st.warning("⚠️ Las cantidades cambiaron: presiona 'Calcular' para revisar el resumen y el precio antes de procesar")
+                elif total_canastillas > 0:
+                    try:
+                        datos_pedido = dict(
+                            cliente_id=cliente_seleccionado,
+                            fecha=fecha_pedido,
+                            hora=hora_pedido,
+                            canastillas_c=canastillas_pedido['C'],
+                            canastillas_b=canastillas_pedido['B'],
+                            canastillas_a=canastillas_pedido['A'],
+                            canastillas_aa=canastillas_pedido['AA'],
+                            canastillas_aaa=canastillas_pedido['AAA'],
+                            canastillas_jumbo=canastillas_pedido['Jumbo'],
+                            precio_total=precio_ajustado,
+                            observaciones=observaciones if observaciones else None
+                        )
+                        
+                        if tipo_pedido == 'despachar_ahora':
+                            # Pedido y despacho en una sola transacción
+                            pedido_id = self.pedidos_repo.crear_y_despachar_pedido(
+                                **datos_pedido,
+                                observaciones_despacho="Despacho inmediato"
                             )
-                            
                             st.success(f"✅ Pedido #{pedido_id} creado exitosamente")
-                            
-                            # Si se debe despachar inmediatamente
-                            if tipo_pedido == 'despachar_ahora':
-                                self.pedidos_repo.despachar_pedido(
-                                    pedido_id=pedido_id,
-                                    fecha=fecha_pedido,
-                                    hora=hora_pedido.strftime("%H:%M:%S"),
-                                    canastillas_c=canastillas_pedido['C'],
-                                    canastillas_b=canastillas_pedido['B'],
-                                    canastillas_a=canastillas_pedido['A'],
-                                    canastillas_aa=canastillas_pedido['AA'],
-                                    canastillas_aaa=canastillas_pedido['AAA'],
-                                    canastillas_jumbo=canastillas_pedido['Jumbo'],
-                                    observaciones="Despacho inmediato"
-                                )
-                                st.success(f"✅ Pedido #{pedido_id} despachado exitosamente")
-                                st.balloons()
-                            
-                            st.rerun()
-                            
-                        except Exception as e:
-                            st.error(f"❌ Error al crear el pedido: {str(e)}")
+                            st.success(f"✅ Pedido #{pedido_id} despachado exitosamente")
+                            st.balloons()
+                        else:
+                            # Crear el pedido
+                            pedido_id = self.pedidos_repo.crear_pedido(**datos_pedido)
+                            st.success(f"✅ Pedido #{pedido_id} creado exitosamente")
+                        
+                        st.session_state.pop('pedido_calculado', None)
+                        st.rerun()
+                        
+                    except Exception as e:
+                        st.error(f"❌ Error al crear el pedido: {str(e)}")
                 else:
                     st.warning("⚠️ Agrega al menos una canastilla para crear el pedido")
         
@@ -327,6 +439,9 @@ class VentasModule:
                 st.markdown("### 📋 Pedidos Pendientes")
                 
                 for pedido in pedidos_pendientes:
+                    # Canastillas por categoría, leídas una vez para el detalle y la edición
+                    canastillas = dict(zip(self.categorias, _canastillas_pedido(pedido)))
+                    
                     with st.expander(
                         f"📦 Pedido #{pedido['id']} - {pedido['cliente_nombre']} - {pedido['total_canastillas']} canastillas - ${pedido['precio_total']:,.0f}",
                         expanded=False
@@ -344,11 +459,8 @@ class VentasModule:
                         
                         with col_detalle:
                             st.markdown("**Detalle del Pedido:**")
-                            categorias_db = ['canastillas_c', 'canastillas_b', 'canastillas_a', 
-                                           'canastillas_aa', 'canastillas_aaa', 'canastillas_jumbo']
                             
-                            for cat, cat_db in zip(self.categorias, categorias_db):
-                                cantidad = pedido.get(cat_db, 0)
+                            for cat, cantidad in canastillas.items():
                                 if cantidad > 0:
                                     huevos = cantidad * self.HUEVOS_POR_CANASTILLA
                                     st.write(f"📦 {cat}: {cantidad} canastillas ({huevos} huevos)")
@@ -366,7 +478,7 @@ class VentasModule:
                                     self.pedidos_repo.despachar_pedido(
                                         pedido_id=pedido['id'],
                                         fecha=date.today(),
-                                        hora=datetime.now().strftime("%H:%M:%S"),
+                                        hora=datetime.now().time(),
                                         canastillas_c=pedido['canastillas_c'],
                                         canastillas_b=pedido['canastillas_b'],
                                         canastillas_a=pedido['canastillas_a'],
@@ -400,59 +512,58 @@ class VentasModule:
                             st.markdown("---")
                             st.markdown("### ✏️ Editar Pedido")
                             
-                            cols_edit = st.columns(6)
-                            nuevas_cantidades = {}
-                            
-                            for col, cat, cat_db in zip(cols_edit, self.categorias, categorias_db):
-                                with col:
-                                    nuevas_cantidades[cat] = st.number_input(
-                                        f"{cat}",
-                                        min_value=0,
-                                        step=1,
-                                        value=pedido.get(cat_db, 0),
-                                        key=f"edit_{cat}_{pedido['id']}"
-                                    )
-                            
-                            nuevo_total = sum(nuevas_cantidades.values())
-                            
-                            if nuevo_total > 0:
-                                # Obtener precios actuales
-                                precios = self.precios_repo.obtener_precio_actual()
-                                categorias_db_precios = ['precio_c', 'precio_b', 'precio_a', 
-                                                        'precio_aa', 'precio_aaa', 'precio_jumbo']
+                            with st.form(f"form_edit_{pedido['id']}"):
+                                cols_edit = st.columns(6)
+                                nuevas_cantidades = {}
                                 
-                                nuevo_precio = sum([
-                                    nuevas_cantidades[cat] * precios.get(precio_db, 0) * self.HUEVOS_POR_CANASTILLA
-                                    for cat, precio_db in zip(self.categorias, categorias_db_precios)
-                                ])
-                                
-                                st.info(f"📦 Nuevo total: {nuevo_total} canastillas - ${nuevo_precio:,.0f}")
+                                for col, (cat, cantidad) in zip(cols_edit, canastillas.items()):
+                                    with col:
+                                        nuevas_cantidades[cat] = st.number_input(
+                                            f"{cat}",
+                                            min_value=0,
+                                            step=1,
+                                            value=cantidad,
+                                            key=f"edit_{cat}_{pedido['id']}"
+                                        )
                                 
                                 col_save, col_cancel = st.columns(2)
-                                
                                 with col_save:
-                                    if st.button("💾 Guardar Cambios", key=f"save_edit_{pedido['id']}"):
-                                        try:
-                                            self.pedidos_repo.actualizar_pedido(
-                                                pedido_id=pedido['id'],
-                                                canastillas_c=nuevas_cantidades['C'],
-                                                canastillas_b=nuevas_cantidades['B'],
-                                                canastillas_a=nuevas_cantidades['A'],
-                                                canastillas_aa=nuevas_cantidades['AA'],
-                                                canastillas_aaa=nuevas_cantidades['AAA'],
-                                                canastillas_jumbo=nuevas_cantidades['Jumbo'],
-                                                precio_total=nuevo_precio
-                                            )
-                                            st.success("✅ Pedido actualizado")
-                                            del st.session_state[f'editando_{pedido["id"]}']
-                                            st.rerun()
-                                        except Exception as e:
-                                            st.error(f"❌ Error: {str(e)}")
-                                
+                                    guardar = st.form_submit_button("💾 Guardar Cambios")
                                 with col_cancel:
-                                    if st.button("❌ Cancelar Edición", key=f"cancel_edit_{pedido['id']}"):
+                                    cancelar_edicion = st.form_submit_button("❌ Cancelar Edición")
+                            
+                            if cancelar_edicion:
+                                del st.session_state[f'editando_{pedido["id"]}']
+                                st.rerun()
+                            
+                            if guardar:
+                                nuevo_total = sum(nuevas_cantidades.values())
+                                
+                                if nuevo_total > 0:
+                                    # Precio con los precios actuales
+                                    precios = self.precios_repo.obtener_precio_actual()
+                                    nuevo_precio = sum(map(
+                                        mul, nuevas_cantidades.values(), self._precios_canastilla(precios)
+                                    ))
+                                    
+                                    try:
+                                        self.pedidos_repo.actualizar_pedido(
+                                            pedido_id=pedido['id'],
+                                            canastillas_c=nuevas_cantidades['C'],
+                                            canastillas_b=nuevas_cantidades['B'],
+                                            canastillas_a=nuevas_cantidades['A'],
+                                            canastillas_aa=nuevas_cantidades['AA'],
+                                            canastillas_aaa=nuevas_cantidades['AAA'],
+                                            canastillas_jumbo=nuevas_cantidades['Jumbo'],
+                                            precio_total=nuevo_precio
+                                        )
+                                        st.success(f"✅ Pedido actualizado: {nuevo_total} canastillas - ${nuevo_precio:,.0f}")
                                         del st.session_state[f'editando_{pedido["id"]}']
                                         st.rerun()
+                                    except Exception as e:
+                                        st.error(f"❌ Error: {str(e)}")
+                                else:
+                                    st.warning("⚠️ El pedido debe tener al menos una canastilla")
             else:
                 st.success("✅ No hay pedidos pendientes")
                 st.info("💡 Crea un nuevo pedido en la pestaña 'Crear Pedido'")
@@ -482,20 +593,23 @@ class VentasModule:
             )
         
         try:
-            ventas = self.pedidos_repo.obtener_historial_ventas(fecha_inicio, fecha_fin)
+            # Resumen y gráficos desde agregados SQL (una fila por día o por
+            # cliente); el detalle venta por venta solo se lee a pedido
+            ventas_diarias = self.reportes_repo.obtener_ventas_diarias_periodo(fecha_inicio, fecha_fin)
             
-            if ventas:
-                df = pd.DataFrame(ventas)
+            if ventas_diarias:
+                df_diarias = pd.DataFrame(ventas_diarias)
+                total_ventas = int(df_diarias['cantidad_ventas'].sum())
                 
                 # Métricas generales
                 st.markdown("### 📈 Resumen del Período")
                 col_m1, col_m2, col_m3, col_m4 = st.columns(4)
                 
                 with col_m1:
-                    st.metric("Total Ventas", len(df))
+                    st.metric("Total Ventas", total_ventas)
                 
                 with col_m2:
-                    total_canastillas = df['total_canastillas'].sum()
+                    total_canastillas = df_diarias['total_canastillas'].sum()
                     st.metric("Canastillas Vendidas", f"{total_canastillas:,.0f}")
                 
                 with col_m3:
@@ -503,72 +617,65 @@ class VentasModule:
                     st.metric("Huevos Vendidos", f"{total_huevos:,.0f}")
                 
                 with col_m4:
-                    total_ingresos = df['precio_total'].sum()
+                    total_ingresos = df_diarias['total_ingresos'].sum()
                     st.metric("Ingresos", f"${total_ingresos:,.0f}")
                 
                 st.markdown("---")
                 
-                # Gráficos
+                # Gráficos: ingresos por día y top clientes
+                fig_ventas, fig_clientes = _figuras_historial_ventas(
+                    fecha_inicio, fecha_fin, db.data_version
+                )
                 col_graf1, col_graf2 = st.columns(2)
                 
                 with col_graf1:
-                    # Ventas por día
-                    df['fecha'] = pd.to_datetime(df['fecha'])
-                    ventas_diarias = df.groupby('fecha')['precio_total'].sum().reset_index()
-                    
-                    fig_ventas = px.line(
-                        ventas_diarias,
-                        x='fecha',
-                        y='precio_total',
-                        title='Ingresos por Día',
-                        labels={'fecha': 'Fecha', 'precio_total': 'Ingresos ($)'},
-                        markers=True
-                    )
                     st.plotly_chart(fig_ventas, use_container_width=True)
                 
                 with col_graf2:
-                    # Top clientes
-                    top_clientes = df.groupby('cliente_nombre')['precio_total'].sum().sort_values(ascending=False).head(5)
-                    
-                    fig_clientes = px.bar(
-                        x=top_clientes.values,
-                        y=top_clientes.index,
-                        orientation='h',
-                        title='Top 5 Clientes',
-                        labels={'x': 'Total Comprado ($)', 'y': 'Cliente'}
-                    )
                     st.plotly_chart(fig_clientes, use_container_width=True)
                 
                 # Tabla detallada
                 st.markdown("---")
                 st.markdown("### 📋 Detalle de Ventas")
                 
-                df_display = df[[
-                    'id', 'fecha', 'cliente_nombre', 'canastillas_c', 'canastillas_b',
-                    'canastillas_a', 'canastillas_aa', 'canastillas_aaa', 'canastillas_jumbo',
-                    'total_canastillas', 'precio_total'
-                ]].copy()
-                
-                df_display.columns = [
-                    'ID', 'Fecha', 'Cliente', 'C', 'B', 'A', 'AA', 'AAA', 'Jumbo',
-                    'Total Can.', 'Total $'
-                ]
-                
-                st.dataframe(
-                    df_display,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        "Total $": st.column_config.NumberColumn(format="$%,.0f")
-                    }
-                )
+                # Un toggle y no un expander: el contenido de un expander se
+                # ejecuta aunque esté cerrado
+                if st.toggle("Ver detalle de ventas", key="hist_ventas_detalle"):
+                    col_tamano, col_pagina = st.columns([1, 1])
+                    with col_tamano:
+                        tamano_pagina = st.selectbox(
+                            "Ventas por página", TAMANOS_PAGINA, key="hist_ventas_tamano_pagina"
+                        )
+                    total_paginas = -(-total_ventas // tamano_pagina)
+                    # Al acortar el período la página elegida puede dejar de existir
+                    if st.session_state.get("hist_ventas_pagina", 1) > total_paginas:
+                        st.session_state.hist_ventas_pagina = total_paginas
+                    with col_pagina:
+                        pagina = st.number_input(
+                            f"Página (de {total_paginas})",
+                            min_value=1, max_value=total_paginas, step=1,
+                            key="hist_ventas_pagina"
+                        )
+                    
+                    df = _cargar_historial_ventas(
+                        fecha_inicio, fecha_fin, db.data_version,
+                        tamano_pagina, (pagina - 1) * tamano_pagina
+                    )
+                    
+                    st.dataframe(
+                        _tabla_ventas(df),
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            "Total $": st.column_config.NumberColumn(format="$%,.0f")
+                        }
+                    )
                 
-                # Exportar
+                # Exportar (el período completo, no solo la página visible)
                 if st.button("📥 Exportar a CSV", key="btn_exportar_ventas"):
-                    csv = df_display.to_csv(index=False).encode('utf-8')
                     st.download_button(
                         label="⬇️ Descargar CSV",
-                        data=csv,
+                        data=_generar_csv_ventas(fecha_inicio, fecha_fin, db.data_version),
                         file_name=f"ventas_{fecha_inicio}_a_{fecha_fin}.csv",
                         mime="text/csv"
                     )
@@ -601,15 +708,18 @@ class VentasModule:
                 # Editar cliente
                 st.markdown("### ✏️ Editar Cliente")
                 
+                # Datos de cada cliente por id: etiquetas del selectbox y cliente elegido
+                info_clientes = {c['id']: c for c in clientes}
+                
                 cliente_editar = st.selectbox(
                     "Selecciona el cliente a editar",
-                    options=[c['id'] for c in clientes],
-                    format_func=lambda x: next((c['nombre'] for c in clientes if c['id'] == x), ""),
+                    options=list(info_clientes),
+                    format_func=lambda x: info_clientes[x]['nombre'],
                     key="cliente_editar_select"
                 )
                 
                 if cliente_editar:
-                    cliente_data = next((c for c in clientes if c['id'] == cliente_editar), None)
+                    cliente_data = info_clientes[cliente_editar]
                     
                     col_edit1, col_edit2 = st.columns(2)
                     
@@ -688,6 +798,7 @@ class VentasModule:
 
 
 # Función principal para llamar desde app.py
+@st.fragment
 def render_ventas():
     """Función principal que se llama desde app.py"""
     module = VentasModule()
@@ -13,9 +13,11 @@ from typing import Dict, List
 # Importar la base de datos y repositorios
 import sys
 sys.path.append('..')
-from data.database import db
+from data.database import get_db
 from data.models import InsumosRepository, TrabajadoresRepository, PreciosRepository, ReportesRepository
 
+db = get_db()
+
 
 class InsumosPagosModule:
     """Clase principal del módulo de insumos y pagos"""
@@ -340,7 +342,7 @@ class InsumosPagosModule:
                             pago_id = self.insumos_repo.registrar_pago_trabajador(
                                 trabajador_id=trabajador_seleccionado,
                                 fecha=fecha_pago,
-                                hora=hora_pago.strftime("%H:%M:%S"),
+                                hora=hora_pago,
                                 monto=monto_pago,
                                 concepto=concepto_pago if concepto_pago else None
                             )
@@ -799,6 +801,7 @@ class InsumosPagosModule:
 
 
 # Función principal para llamar desde app.py
+@st.fragment
 def render_insumos_pagos():
     """Función principal que se llama desde app.py"""
     module = InsumosPagosModule()
@@ -11,14 +11,36 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from typing import Dict, List
 import io
+import itertools
 
 # Importar la base de datos y repositorios
 import sys
 sys.path.append('..')
-from data.database import db
+from data.database import get_db
 from data.models import (ReportesRepository, ProduccionRepository, StockRepository, 
                          PedidosRepository, InsumosRepository, PreciosRepository)
 
+# Database memoriza las lecturas entre reruns; las escrituras invalidan el caché
+db = get_db()
+
+
+def _dataframe_desde_filas(filas):
+    """Construye un DataFrame leyendo las filas sqlite3.Row de un generador"""
+    filas = iter(filas)
+    primera = next(filas, None)
+    if primera is None:
+        return pd.DataFrame()
+    return pd.DataFrame.from_records(itertools.chain([primera], filas), columns=primera.keys())
+
+
+@st.cache_data(ttl=300, max_entries=20, show_spinner=False)
+def _generar_excel_cacheado(fecha_inicio, fecha_fin, opciones, data_version):
+    """
+    Guarda los bytes del Excel ya generado: repetir la exportación con el mismo
+    período y opciones no vuelve a armar los DataFrames ni a escribir con openpyxl.
+    """
+    return ReportesModule()._generar_excel(fecha_inicio, fecha_fin, *opciones)
+
 
 class ReportesModule:
     """Clase principal del módulo de reportes"""
@@ -36,6 +58,13 @@ class ReportesModule:
         """Renderiza la interfaz completa del módulo"""
         st.header("📈 Reportes y Análisis")
         
+        # Alertas y stock en una sola lectura consistente
+        try:
+            self.dashboard = self.reportes_repo.obtener_dashboard_inicial()
+        except Exception as e:
+            st.error(f"❌ Error al cargar el resumen: {str(e)}")
+            return
+        
         # Alertas en la parte superior
         self._mostrar_alertas()
         
@@ -69,7 +98,7 @@ class ReportesModule:
         """Muestra alertas importantes en la parte superior"""
         try:
             # Alertas de stock bajo de insumos
-            alertas_stock = self.stock_repo.obtener_alertas_stock()
+            alertas_stock = self.dashboard['alertas']
             
             if alertas_stock:
                 st.warning(f"⚠️ **ALERTAS ACTIVAS ({len(alertas_stock)})**")
@@ -133,6 +162,16 @@ class ReportesModule:
         
         return fecha_inicio, fecha_fin, periodo_preset
     
+    def _obtener_kpis(self, periodos: List[tuple]) -> List[tuple]:
+        """
+        Balance y resumen de producción/ventas de cada período.
+        """
+        return [
+            (self.reportes_repo.obtener_balance_periodo(fecha_inicio, fecha_fin),
+             self.reportes_repo.obtener_resumen_produccion_ventas(fecha_inicio, fecha_fin))
+            for fecha_inicio, fecha_fin in periodos
+        ]
+    
     def _render_dashboard_general(self):
         """Dashboard ejecutivo con KPIs principales"""
         st.subheader("📊 Dashboard Ejecutivo")
@@ -152,14 +191,15 @@ class ReportesModule:
             fecha_fin_anterior = fecha_inicio - timedelta(days=1)
         
         try:
-            # Obtener datos del período actual
-            balance = self.reportes_repo.obtener_balance_periodo(fecha_inicio, fecha_fin)
-            resumen_prod_ventas = self.reportes_repo.obtener_resumen_produccion_ventas(fecha_inicio, fecha_fin)
+            # Obtener datos del período actual (y del anterior si se compara)
+            periodos = [(fecha_inicio, fecha_fin)]
+            if comparar:
+                periodos.append((fecha_inicio_anterior, fecha_fin_anterior))
+            kpis = self._obtener_kpis(periodos)
             
-            # Datos del período anterior si se compara
+            balance, resumen_prod_ventas = kpis[0]
             if comparar:
-                balance_anterior = self.reportes_repo.obtener_balance_periodo(fecha_inicio_anterior, fecha_fin_anterior)
-                resumen_anterior = self.reportes_repo.obtener_resumen_produccion_ventas(fecha_inicio_anterior, fecha_fin_anterior)
+                balance_anterior, resumen_anterior = kpis[1]
             
             # KPIs principales
             st.markdown("### 📈 Indicadores Clave")
@@ -339,7 +379,7 @@ class ReportesModule:
                 with col_graf1:
                     if prod_diaria:
                         df_prod = pd.DataFrame(prod_diaria)
-                        df_prod['fecha'] = pd.to_datetime(df_prod['fecha'])
+                        df_prod['fecha'] = pd.to_datetime(df_prod['fecha'], format='%Y-%m-%d')
                         
                         fig_prod = px.line(
                             df_prod,
@@ -354,7 +394,7 @@ class ReportesModule:
                 with col_graf2:
                     if ventas_diarias:
                         df_ventas = pd.DataFrame(ventas_diarias)
-                        df_ventas['fecha'] = pd.to_datetime(df_ventas['fecha'])
+                        df_ventas['fecha'] = pd.to_datetime(df_ventas['fecha'], format='%Y-%m-%d')
                         
                         fig_ventas = px.line(
                             df_ventas,
@@ -370,7 +410,7 @@ class ReportesModule:
             st.markdown("---")
             st.markdown("### 📦 Estado del Stock")
             
-            stock_stats = self.reportes_repo.obtener_estadisticas_stock()
+            stock_stats = self.dashboard['estadisticas_stock']
             
             if stock_stats:
                 total_stock = stock_stats.get('total_huevos', 0) or 0
@@ -421,7 +461,7 @@ class ReportesModule:
             
             if produccion_diaria:
                 df = pd.DataFrame(produccion_diaria)
-                df['fecha'] = pd.to_datetime(df['fecha'])
+                df['fecha'] = pd.to_datetime(df['fecha'], format='%Y-%m-%d')
                 
                 # Métricas
                 st.markdown("### 📊 Resumen de Producción")
@@ -569,7 +609,7 @@ class ReportesModule:
             historial_ventas = self.pedidos_repo.obtener_historial_ventas(fecha_inicio, fecha_fin)
             
             if historial_ventas:
-                df_ventas = pd.DataFrame(historial_ventas)
+                df_ventas = pd.DataFrame(historial_ventas, columns=historial_ventas[0].keys())
                 
                 # Métricas
                 st.markdown("### 📊 Resumen de Ventas")
@@ -600,7 +640,7 @@ class ReportesModule:
                     
                     with col_g1:
                         df_vd = pd.DataFrame(ventas_diarias)
-                        df_vd['fecha'] = pd.to_datetime(df_vd['fecha'])
+                        df_vd['fecha'] = pd.to_datetime(df_vd['fecha'], format='%Y-%m-%d')
                         
                         fig_ingresos = px.bar(
                             df_vd,
@@ -889,10 +929,11 @@ class ReportesModule:
         with col_btn1:
             if st.button("📥 Exportar a Excel", use_container_width=True, type="primary"):
                 try:
-                    excel_data = self._generar_excel(
+                    excel_data = _generar_excel_cacheado(
                         fecha_inicio, fecha_fin,
-                        incluir_kpis, incluir_produccion, incluir_ventas,
-                        incluir_financiero, incluir_tablas
+                        (incluir_kpis, incluir_produccion, incluir_ventas,
+                         incluir_financiero, incluir_tablas),
+                        get_db().data_version
                     )
                     
                     st.download_button(
@@ -957,23 +998,23 @@ class ReportesModule:
             
             # Hoja 2: Producción
             if incluir_produccion and incluir_tablas:
-                produccion = self.reportes_repo.obtener_produccion_diaria_periodo(fecha_inicio, fecha_fin)
-                if produccion:
-                    df_prod = pd.DataFrame(produccion)
+                df_prod = _dataframe_desde_filas(
+                    self.reportes_repo.obtener_produccion_diaria_periodo_iter(fecha_inicio, fecha_fin))
+                if not df_prod.empty:
                     df_prod.to_excel(writer, sheet_name='Producción', index=False)
             
             # Hoja 3: Ventas
             if incluir_ventas and incluir_tablas:
-                ventas = self.pedidos_repo.obtener_historial_ventas(fecha_inicio, fecha_fin)
-                if ventas:
-                    df_ventas = pd.DataFrame(ventas)
+                df_ventas = _dataframe_desde_filas(
+                    self.pedidos_repo.obtener_historial_ventas_iter(fecha_inicio, fecha_fin))
+                if not df_ventas.empty:
                     df_ventas.to_excel(writer, sheet_name='Ventas', index=False)
             
             # Hoja 4: Financiero
             if incluir_financiero and incluir_tablas:
-                movimientos = self.reportes_repo.obtener_todos_movimientos(fecha_inicio, fecha_fin)
-                if movimientos:
-                    df_mov = pd.DataFrame(movimientos)
+                df_mov = _dataframe_desde_filas(
+                    self.reportes_repo.obtener_todos_movimientos_iter(fecha_inicio, fecha_fin))
+                if not df_mov.empty:
                     df_mov.to_excel(writer, sheet_name='Movimientos', index=False)
         
         output.seek(0)
@@ -981,6 +1022,7 @@ class ReportesModule:
 
 
 # Función principal para llamar desde app.py
+@st.fragment
 def render_reportes():
     """Función principal que se llama desde app.py"""
     module = ReportesModule()
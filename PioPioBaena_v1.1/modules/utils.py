@@ -1,8 +1,8 @@
 # pages/utils.py
 import os
 import base64
+from pathlib import Path
 import pandas as pd
-from PIL import Image
 import streamlit as st
 
 # =========================
@@ -10,20 +10,21 @@ import streamlit as st
 # =========================
 @st.cache_data
 def load_logo(path: str):
+    """Lee los bytes del logo una sola vez; st.image los decodifica en el navegador."""
     try:
-        return Image.open(path)
+        return Path(path).read_bytes()
     except FileNotFoundError:
         st.warning(f"⚠️ No se encontró el logo en {path}")
         return None
 
 def show_logo(width: int = 120):
-    """Muestra el logo desde el caché o la sesión."""
-    if "logo" not in st.session_state:
-        st.session_state.logo = load_logo("images/Logo.png")
-    if st.session_state.logo:
-        st.image(st.session_state.logo, width=width)
+    """Muestra el logo desde el caché."""
+    logo = load_logo("images/Logo.png")
+    if logo:
+        st.image(logo, width=width)
 
 
+@st.cache_data
 def load_font(path):
     with open(path, "rb") as f:
         return base64.b64encode(f.read()).decode()